@@ -0,0 +1,137 @@
+"""
+Restaurant Detail Fetch Strategies Benchmark
+
+Compares main.fetch_detail_split (find_one + find, two round trips) with
+main.fetch_detail_lookup (one $match + $lookup aggregation) against a real
+mongod. Network latency is simulated by a command listener that sleeps for
+--rtt-ms before every command is sent.
+
+Usage:
+    DATABASE_URL=mongodb://localhost:27017 python benchmarks/detail_strategies.py \\
+        --reviews 5000 --rtt-ms 0 1 5 --iterations 200
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient, monitoring
+
+import database
+import main
+from schemas import Restaurant, Review
+
+
+class SimulatedLatency(monitoring.CommandListener):
+    """Delays every command by a fixed round-trip time"""
+
+    def __init__(self, rtt: float):
+        self.rtt = rtt
+        self.commands = 0
+
+    def started(self, event):
+        self.commands += 1
+        if self.rtt:
+            time.sleep(self.rtt)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def seed(client: MongoClient, name: str, reviews: int) -> str:
+    db = client[name]
+    rest_col = main.collection_name(Restaurant)
+    rev_col = main.collection_name(Review)
+    db.drop_collection(rest_col)
+    db.drop_collection(rev_col)
+    database.set_clients(client, None, name=name)
+    for model in (Restaurant, Review):
+        database.ensure_indexes(main.collection_name(model), model.indexes)
+    restaurant_id = str(db[rest_col].insert_one({
+        "name": "Bench Bistro", "address": "1 Test St", "city": "London", "city_key": "london",
+        "cuisine": ["italian"], "dishes": ["risotto"], "takeaway": True, "price_level": 2,
+        "tags": ["cozy"], "rating_sum": 4.0 * reviews, "rating_avg": 4.0, "rating_count": reviews,
+    }).inserted_id)
+    start = datetime.now(timezone.utc)
+    batch = []
+    for i in range(reviews):
+        batch.append({
+            "restaurant_id": restaurant_id, "user_name": f"user{i}", "rating": 1 + i % 5,
+            "comment": "Lovely food " * 8, "photos": [],
+            "created_at": start - timedelta(seconds=i), "updated_at": start,
+        })
+        if len(batch) == 5000:
+            db[rev_col].insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        db[rev_col].insert_many(batch, ordered=False)
+    return restaurant_id
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run_strategy(fetch, restaurant_id: str, args) -> list:
+    for _ in range(args.warmup):
+        await fetch(restaurant_id, args.reviews_limit, None, args.fields)
+    samples = []
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        await fetch(restaurant_id, args.reviews_limit, None, args.fields)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def bench(args, restaurant_id: str):
+    strategies = {"split": main.fetch_detail_split, "lookup": main.fetch_detail_lookup}
+    print(f"{'rtt_ms':>7} {'strategy':>8} {'cmds/op':>8} {'mean_ms':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8}")
+    for rtt_ms in args.rtt_ms:
+        for name, fetch in strategies.items():
+            latency = SimulatedLatency(rtt_ms / 1000)
+            client = AsyncIOMotorClient(args.url, event_listeners=[latency])
+            database.set_clients(None, client, name=args.db)
+            samples = await run_strategy(fetch, restaurant_id, args)
+            client.close()
+            ms = [s * 1000 for s in samples]
+            cmds = latency.commands / (args.iterations + args.warmup)
+            print(f"{rtt_ms:>7} {name:>8} {cmds:>8.1f} {statistics.mean(ms):>8.2f} "
+                  f"{percentile(ms, 50):>8.2f} {percentile(ms, 95):>8.2f} {percentile(ms, 99):>8.2f}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="bench_detail_strategies", help="Scratch database (dropped afterwards)")
+    parser.add_argument("--reviews", type=int, default=5000, help="Reviews seeded for the benchmark restaurant")
+    parser.add_argument("--reviews-limit", type=int, default=10)
+    parser.add_argument("--fields", default=None, help="fields= value passed to both strategies")
+    parser.add_argument("--rtt-ms", type=float, nargs="+", default=[0, 1, 5])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch database")
+    args = parser.parse_args()
+
+    sync_client = MongoClient(args.url)
+    try:
+        restaurant_id = seed(sync_client, args.db, args.reviews)
+        asyncio.run(bench(args, restaurant_id))
+    finally:
+        if not args.keep:
+            sync_client.drop_database(args.db)
+        sync_client.close()
+
+
+if __name__ == "__main__":
+    main_cli()
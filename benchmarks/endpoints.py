@@ -0,0 +1,268 @@
+"""
+Endpoint Benchmark Suite
+
+Drives chatbot_search, list_restaurants, get_restaurant and add_review at a
+fixed concurrency and reports p50/p95/p99 latency and throughput per endpoint.
+
+Targets:
+    inproc - the app is called through httpx's ASGI transport, against a scratch
+             database on --url (--backend mongod) or an in-memory mongomock
+             stand-in (--backend memory, needs mongomock and mongomock_motor)
+    http   - a running server at --base-url, seeded through /api/seed/synthetic
+             when it has no restaurants yet (needs SYNTHETIC_SEED_ENABLED=1)
+
+Results can be saved as a JSON baseline and later compared against it; the
+process exits with status 1 if any endpoint regresses beyond --threshold or
+its error rate goes up.
+
+Usage:
+    python benchmarks/endpoints.py --backend memory --save benchmarks/baseline.json
+    python benchmarks/endpoints.py --backend memory --compare benchmarks/baseline.json --threshold 0.15
+    python benchmarks/endpoints.py --target http --base-url http://localhost:8000 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+ENDPOINTS = ["chatbot_search", "list_restaurants", "get_restaurant", "add_review"]
+# Latency metrics regress when they grow, throughput when it shrinks
+COMPARED = {"p50_ms": 1, "p95_ms": 1, "p99_ms": 1, "rps": -1}
+
+CHAT_QUERIES = [
+    "cheap thai takeaway", "spicy ramen", "indian", "late-night pizza", "vegan options",
+    "fancy italian", "burger takeaway", "pad thai", "sushi", "korean fried chicken",
+]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+# Scenarios: each builds one request from the sampled restaurants
+
+def chatbot_search(client, rng, ctx):
+    city = rng.choice(ctx["cities"]) if rng.random() < 0.5 else None
+    return client.post("/api/chat", json={"query": rng.choice(CHAT_QUERIES), "city": city})
+
+
+def list_restaurants(client, rng, ctx):
+    return client.get("/api/restaurants", params={
+        "city": rng.choice(ctx["cities"]), "sort": rng.choice(("id", "rating")), "limit": 20, "fields": "card",
+    })
+
+
+def get_restaurant(client, rng, ctx):
+    return client.get(f"/api/restaurants/{rng.choice(ctx['ids'])}")
+
+
+def add_review(client, rng, ctx):
+    return client.post("/api/reviews", json={
+        "restaurant_id": rng.choice(ctx["ids"]), "user_name": f"bench{rng.randint(1, 10_000)}",
+        "rating": rng.randint(1, 5), "comment": "Benchmark review",
+    })
+
+
+SCENARIOS = {f.__name__: f for f in (chatbot_search, list_restaurants, get_restaurant, add_review)}
+
+
+async def run_endpoint(client, name, ctx, args) -> dict:
+    scenario = SCENARIOS[name]
+    rng = random.Random(args.seed)
+    samples, errors = [], 0
+
+    async def phase(count: int, measured: bool):
+        remaining = count
+
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    response = await scenario(client, rng, ctx)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                if measured:
+                    samples.append(time.perf_counter() - started)
+                    errors += failed
+
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+    # Warmup runs to completion first, so throughput covers measured requests only
+    await phase(args.warmup, measured=False)
+    started = time.perf_counter()
+    await phase(args.requests, measured=True)
+    elapsed = time.perf_counter() - started
+    ms = [s * 1000 for s in samples]
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+        "rps": round(len(ms) / elapsed, 1),
+    }
+
+
+async def discover(client) -> dict:
+    """Restaurant ids and cities to sample requests from"""
+    response = await client.get("/api/restaurants", params={"limit": 200, "fields": "city"})
+    response.raise_for_status()
+    items = response.json()["items"]
+    return {"ids": [d["id"] for d in items], "cities": sorted({d["city"] for d in items})}
+
+
+def setup_inproc(args):
+    """Point the app at the chosen backend and load the synthetic dataset"""
+    import database
+    import main
+    from synthetic import generate_restaurants, generate_reviews, seed_synthetic
+
+    if args.backend == "memory":
+        try:
+            import mongomock
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("--backend memory needs the mongomock and mongomock_motor packages")
+        client = mongomock.MongoClient()
+        database.set_clients(client, AsyncMongoMockClient(mock_mongo_client=client), name=args.db)
+        # mongomock has no $merge, so insert directly and leave ratings at zero
+        run_id = int(time.time())
+        db = database.get_db()
+        db["restaurant"].insert_many(list(generate_restaurants(run_id, 0, args.restaurants, args.seed)))
+        if args.reviews:
+            db["review"].insert_many(list(generate_reviews(run_id, args.restaurants, 0, args.reviews, args.seed)))
+    else:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from pymongo import MongoClient
+
+        client = MongoClient(args.url)
+        client.drop_database(args.db)
+        database.set_clients(client, AsyncIOMotorClient(args.url), name=args.db)
+        seed_synthetic(args.restaurants, args.reviews, workers=1, seed=args.seed)
+    # Build the chat index before measuring anything
+    main.refresh_restaurant_index(rebuild=True)
+    return main.app
+
+
+async def bench(args) -> dict:
+    if args.target == "inproc":
+        app = setup_inproc(args)
+        # Keeps the chat index refreshed, as the server's startup hook would
+        await app.router.startup()
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench")
+    else:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        client = httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30)
+
+    async with client:
+        if args.target == "http":
+            listing = await client.get("/api/restaurants", params={"limit": 1})
+            if not listing.json()["items"]:
+                seeded = await client.post("/api/seed/synthetic", params={
+                    "restaurants": args.restaurants, "reviews": args.reviews, "seed": args.seed,
+                }, timeout=None)
+                if seeded.status_code != 200:
+                    sys.exit(f"Seeding failed ({seeded.status_code}): {seeded.text}; "
+                             "start the server with SYNTHETIC_SEED_ENABLED=1 or run manage.py seed")
+        ctx = await discover(client)
+        if not ctx["ids"]:
+            sys.exit("No restaurants to benchmark against")
+        results = {}
+        for name in args.endpoints:
+            results[name] = await run_endpoint(client, name, ctx, args)
+            r = results[name]
+            print(f"{name:>17} {r['requests']:>8} {r['errors']:>6} {r['p50_ms']:>8.2f} "
+                  f"{r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['rps']:>9.1f}")
+    if args.target == "inproc":
+        await app.router.shutdown()
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Human-readable regressions of results against a saved baseline"""
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        for metric, direction in COMPARED.items():
+            old, new = before.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * direction
+            if change > threshold:
+                regressions.append(f"{name} {metric}: {old} -> {new} ({change:+.1%} worse)")
+        # Errors usually start at zero, so any rise in the error rate counts, whatever the threshold
+        old_rate = before.get("errors", 0) / max(before.get("requests", 0), 1)
+        new_rate = current.get("errors", 0) / max(current.get("requests", 0), 1)
+        if new_rate > old_rate:
+            regressions.append(f"{name} errors: {before.get('errors', 0)}/{before.get('requests', 0)} -> "
+                               f"{current.get('errors', 0)}/{current.get('requests', 0)} ({old_rate:.2%} -> {new_rate:.2%})")
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=("inproc", "http"), default="inproc")
+    parser.add_argument("--backend", choices=("memory", "mongod"), default="mongod", help="Database for --target inproc")
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="bench_endpoints", help="Scratch database (dropped and reseeded)")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="Server for --target http")
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=None)
+    parser.add_argument("--restaurants", type=int, default=2000)
+    parser.add_argument("--reviews", type=int, default=50_000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000, help="Measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="PATH", help="Write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Baseline to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative regression (default: 0.10)")
+    args = parser.parse_args()
+    if args.endpoints is None:
+        args.endpoints = list(ENDPOINTS)
+        if args.target == "inproc" and args.backend == "memory":
+            # mongomock does not implement $round, used by the rating update
+            args.endpoints.remove("add_review")
+
+    print(f"{'endpoint':>17} {'requests':>8} {'errors':>6} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} {'req/s':>9}")
+    results = asyncio.run(bench(args))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "config": {k: getattr(args, k) for k in (
+                    "target", "backend", "restaurants", "reviews", "concurrency", "requests", "seed")},
+                "python": platform.python_version(),
+                "results": results,
+            }, f, indent=2)
+        print(f"Baseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,134 @@
+"""
+In-process LRU + TTL Cache
+
+Entries are evicted least-recently-used once maxsize is reached and expire
+ttl seconds after being stored. Entries can carry tags so every variant of a
+payload (e.g. all cached pages of one restaurant) can be invalidated at once.
+Each worker process has its own cache.
+
+A loader that reads before a write and stores after its invalidation would
+re-cache stale data, so loaders take a token() before reading and pass it to
+set(), which skips the store if the tags were invalidated (or the cache was
+cleared) in between.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Set
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_sets = 0
+        # Bumped by clear(); per-tag counters are bumped by invalidate_tag()
+        self._generation = 0
+        self._tag_generations: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires, value, _ = entry
+            if expires <= time.monotonic():
+                self._discard(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def token(self, tags: Iterable[Hashable] = ()) -> tuple:
+        """Snapshot of the invalidation state of tags, for a later set()"""
+        with self._lock:
+            return self._token(tuple(tags))
+
+    def _token(self, tags: tuple) -> tuple:
+        return (self._generation,) + tuple(self._tag_generations.get(tag, 0) for tag in tags)
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[Hashable] = (), token: tuple = None) -> bool:
+        """Store value; with a token, only if tags were not invalidated since it was taken"""
+        with self._lock:
+            tags = tuple(tags)
+            if token is not None and token != self._token(tags):
+                self.stale_sets += 1
+                return False
+            if key in self._data:
+                self._discard(key)
+            self._data[key] = (time.monotonic() + self.ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._discard(next(iter(self._data)))
+                self.evictions += 1
+            return True
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if key in self._data:
+                self._discard(key)
+                self.invalidations += 1
+
+    def invalidate_tag(self, tag: Hashable):
+        """Drop every entry stored with the given tag"""
+        with self._lock:
+            self._tag_generations[tag] = self._tag_generations.get(tag, 0) + 1
+            if len(self._tag_generations) > 4 * self.maxsize:
+                # Bound the counters: forgetting them is safe once every token is outdated
+                self._tag_generations.clear()
+                self._generation += 1
+            for key in self._tags.pop(tag, ()):
+                if key in self._data:
+                    self._discard(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._tag_generations.clear()
+            self.invalidations += len(self._data)
+            self._data.clear()
+            self._tags.clear()
+
+    def _discard(self, key: Hashable):
+        _, _, tags = self._data.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "stale_sets": self.stale_sets,
+            }
@@ -5,46 +5,167 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from pymongo import MongoClient, IndexModel, UpdateOne, DeleteOne, DeleteMany
+from pymongo.errors import BulkWriteError, OperationFailure
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime, timezone
 import os
+import threading
 from dotenv import load_dotenv
-from typing import Union
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple, Union
 from pydantic import BaseModel
 
+from monitoring import PoolMetrics, command_metrics
+from slowlog import SlowQueryLog
+
 # Load environment variables from .env file
 load_dotenv()
 
+# Clients are created lazily on first use and belong to the process that made
+# them (_owner_pid); a forked worker opens its own instead of reusing the parent's.
+# The sync client serves scripts and maintenance, the async (motor) one the endpoints.
 _client = None
-db = None
+_async_client = None
+_owner_pid = None
+_lock = threading.Lock()
 
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
-if database_url and database_name:
-    _client = MongoClient(database_url)
-    db = _client[database_name]
+# Connection pool settings, e.g. DATABASE_MAX_POOL_SIZE=200
+_POOL_OPTIONS = {
+    "maxPoolSize": "DATABASE_MAX_POOL_SIZE",
+    "minPoolSize": "DATABASE_MIN_POOL_SIZE",
+    "maxConnecting": "DATABASE_MAX_CONNECTING",
+    "maxIdleTimeMS": "DATABASE_MAX_IDLE_TIME_MS",
+    "waitQueueTimeoutMS": "DATABASE_WAIT_QUEUE_TIMEOUT_MS",
+    "connectTimeoutMS": "DATABASE_CONNECT_TIMEOUT_MS",
+    "socketTimeoutMS": "DATABASE_SOCKET_TIMEOUT_MS",
+    "serverSelectionTimeoutMS": "DATABASE_SERVER_SELECTION_TIMEOUT_MS",
+}
 
-# Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
-    """Insert a single document with timestamp"""
-    if db is None:
-        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+# Pool event counters per client, see pool_stats()
+pool_metrics = {"sync": PoolMetrics(), "async": PoolMetrics()}
+
+def client_options() -> Dict[str, Any]:
+    """MongoClient keyword arguments read from the DATABASE_* environment variables"""
+    options = {}
+    for option, env_var in _POOL_OPTIONS.items():
+        value = os.getenv(env_var)
+        if value:
+            options[option] = int(value)
+    return options
+
+def pool_stats() -> Dict[str, dict]:
+    """Snapshot of the connection pool counters for each client"""
+    return {name: metrics.snapshot() for name, metrics in pool_metrics.items()}
+
+def _check_process():
+    global _client, _async_client, _owner_pid
+    if _owner_pid != os.getpid():
+        # Never touch a parent's client from a child: just drop the references
+        _client = None
+        _async_client = None
+        _owner_pid = os.getpid()
+        for metrics in pool_metrics:
+            pool_metrics[metrics] = PoolMetrics()
+
+def get_db():
+    """Synchronous database handle, connecting on first use (None if not configured)"""
+    global _client
+    with _lock:
+        _check_process()
+        if _client is None:
+            if not (database_url and database_name):
+                return None
+            _client = MongoClient(database_url, event_listeners=[pool_metrics["sync"], command_metrics, slow_query_log], **client_options())
+        return _client[database_name]
+
+def get_async_db():
+    """Async (motor) database handle, connecting on first use (None if not configured)"""
+    global _async_client
+    with _lock:
+        _check_process()
+        if _async_client is None:
+            if not (database_url and database_name):
+                return None
+            _async_client = AsyncIOMotorClient(database_url, event_listeners=[pool_metrics["async"], command_metrics, slow_query_log], **client_options())
+        return _async_client[database_name]
 
+# Slow reads are explained on the synchronous client, off the request path
+slow_query_log = SlowQueryLog(get_db)
+
+def set_clients(client=None, async_client=None, name: str = None):
+    """Install pre-built clients, e.g. with extra listeners or an in-memory stand-in
+
+    They are owned by the current process and used by get_db()/get_async_db();
+    name overrides DATABASE_NAME.
+    """
+    global _client, _async_client, _owner_pid, database_name
+    with _lock:
+        if name:
+            database_name = name
+        _owner_pid = os.getpid()
+        _client = client
+        _async_client = async_client
+
+def close_clients():
+    """Close this process's clients; the next get_db()/get_async_db() reconnects"""
+    global _client, _async_client
+    with _lock:
+        if _owner_pid == os.getpid():
+            if _client is not None:
+                _client.close()
+            if _async_client is not None:
+                _async_client.close()
+        _client = None
+        _async_client = None
+
+def __getattr__(name: str):
+    # `database.db` / `database.adb` keep working, resolved lazily
+    if name == "db":
+        return get_db()
+    if name == "adb":
+        return get_async_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _after_fork_in_child():
+    global _lock
+    # The parent may have held the lock while forking
+    _lock = threading.Lock()
+    _check_process()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+# Helper functions for common database operations
+def _timestamped(data: Union[BaseModel, dict]) -> dict:
     # Convert Pydantic model to dict if needed
     if isinstance(data, BaseModel):
         data_dict = data.model_dump()
     else:
         data_dict = data.copy()
 
-    data_dict['created_at'] = datetime.now(timezone.utc)
-    data_dict['updated_at'] = datetime.now(timezone.utc)
+    now = datetime.now(timezone.utc)
+    # Imported documents may carry their original creation time
+    if data_dict.get('created_at') is None:
+        data_dict['created_at'] = now
+    data_dict['updated_at'] = now
+    return data_dict
+
+def create_document(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp"""
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
 
-    result = db[collection_name].insert_one(data_dict)
+    result = db[collection_name].insert_one(_timestamped(data))
     return str(result.inserted_id)
 
 def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
     """Get documents from collection"""
+    db = get_db()
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
     
@@ -53,3 +174,291 @@ def get_documents(collection_name: str, filter_dict: dict = None, limit: int = N
         cursor = cursor.limit(limit)
     
     return list(cursor)
+
+def iter_documents(collection_name: str, filter_dict: dict = None, projection: dict = None,
+                   sort: List[Tuple[str, int]] = None, batch_size: int = None, max_time_ms: int = None,
+                   limit: int = None) -> Iterator[dict]:
+    """Yield documents one at a time from a server-side cursor
+
+    Only one batch (batch_size documents) is held in memory at a time, so large
+    scans run in constant memory. The cursor is closed when the generator is.
+    """
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    cursor = db[collection_name].find(filter_dict or {}, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    if batch_size:
+        cursor = cursor.batch_size(batch_size)
+    if max_time_ms:
+        cursor = cursor.max_time_ms(max_time_ms)
+    if limit:
+        cursor = cursor.limit(limit)
+    with cursor:
+        yield from cursor
+
+def find_one_document(collection_name: str, filter_dict: dict = None, projection: dict = None,
+                      sort: List[Tuple[str, int]] = None, max_time_ms: int = None):
+    """Get the first matching document (or None); the server stops at the first hit"""
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    options = {}
+    if sort:
+        options["sort"] = sort
+    if max_time_ms:
+        options["max_time_ms"] = max_time_ms
+    return db[collection_name].find_one(filter_dict or {}, projection, **options)
+
+async def create_document_async(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp (async)"""
+    adb = get_async_db()
+    if adb is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    result = await adb[collection_name].insert_one(_timestamped(data))
+    return str(result.inserted_id)
+
+async def get_documents_async(collection_name: str, filter_dict: dict = None, limit: int = None):
+    """Get documents from collection (async)"""
+    adb = get_async_db()
+    if adb is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    cursor = adb[collection_name].find(filter_dict or {})
+    if limit:
+        cursor = cursor.limit(limit)
+
+    return await cursor.to_list(length=None)
+
+# Bulk helpers: work is sent in chunks of chunk_size documents, one round trip
+# per chunk. Writes are unordered, so one bad document does not stop the rest
+# of its chunk; failures are reported per chunk in the returned summary.
+
+def _chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _as_object_id(document_id: Union[str, ObjectId]) -> ObjectId:
+    return document_id if isinstance(document_id, ObjectId) else ObjectId(document_id)
+
+def _batch_errors(batch_no: int, offset: int, exc: BulkWriteError) -> dict:
+    return {
+        "batch": batch_no,
+        "offset": offset,
+        "errors": [
+            {"index": offset + e["index"], "code": e.get("code"), "message": e.get("errmsg")}
+            for e in exc.details.get("writeErrors", [])
+        ],
+    }
+
+def _insert_summary() -> dict:
+    return {"inserted_count": 0, "inserted_ids": [], "errors": []}
+
+def _record_insert(summary: dict, batch: List[dict], failed: set):
+    ids = [str(doc["_id"]) for i, doc in enumerate(batch) if i not in failed]
+    summary["inserted_ids"].extend(ids)
+    summary["inserted_count"] += len(ids)
+
+def create_documents(collection_name: str, data: Iterable[Union[BaseModel, dict]], chunk_size: int = 1000) -> dict:
+    """Insert many documents with timestamps using unordered insert_many per chunk
+
+    Returns {"inserted_count", "inserted_ids", "errors"}; each error entry names
+    the chunk and the failing documents' positions in data.
+    """
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    summary = _insert_summary()
+    offset = 0
+    for batch_no, batch in enumerate(_chunks((_timestamped(d) for d in data), chunk_size)):
+        failed = set()
+        try:
+            db[collection_name].insert_many(batch, ordered=False)
+        except BulkWriteError as exc:
+            error = _batch_errors(batch_no, offset, exc)
+            failed = {e["index"] - offset for e in error["errors"]}
+            summary["errors"].append(error)
+        _record_insert(summary, batch, failed)
+        offset += len(batch)
+    return summary
+
+async def create_documents_async(collection_name: str, data: Iterable[Union[BaseModel, dict]], chunk_size: int = 1000) -> dict:
+    """Insert many documents with timestamps using unordered insert_many per chunk (async)"""
+    adb = get_async_db()
+    if adb is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    summary = _insert_summary()
+    offset = 0
+    for batch_no, batch in enumerate(_chunks((_timestamped(d) for d in data), chunk_size)):
+        failed = set()
+        try:
+            await adb[collection_name].insert_many(batch, ordered=False)
+        except BulkWriteError as exc:
+            error = _batch_errors(batch_no, offset, exc)
+            failed = {e["index"] - offset for e in error["errors"]}
+            summary["errors"].append(error)
+        _record_insert(summary, batch, failed)
+        offset += len(batch)
+    return summary
+
+def _bulk_write(collection_name: str, requests: Iterable[Any], chunk_size: int) -> dict:
+    # A request may be an error message instead of an operation, for an item
+    # that could not be turned into one; it is reported at its position
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    summary = {"matched_count": 0, "modified_count": 0, "upserted_count": 0, "deleted_count": 0, "errors": []}
+    offset = 0
+    for batch_no, batch in enumerate(_chunks(requests, chunk_size)):
+        positions = [i for i, r in enumerate(batch) if not isinstance(r, str)]
+        errors = [{"index": offset + i, "code": None, "message": r} for i, r in enumerate(batch) if isinstance(r, str)]
+        result = {}
+        if positions:
+            try:
+                result = db[collection_name].bulk_write([batch[i] for i in positions], ordered=False).bulk_api_result
+            except BulkWriteError as exc:
+                result = exc.details
+                errors += [
+                    {"index": offset + positions[e["index"]], "code": e.get("code"), "message": e.get("errmsg")}
+                    for e in result.get("writeErrors", [])
+                ]
+        if errors:
+            summary["errors"].append({"batch": batch_no, "offset": offset,
+                                      "errors": sorted(errors, key=lambda e: e["index"])})
+        summary["matched_count"] += result.get("nMatched", 0)
+        summary["modified_count"] += result.get("nModified", 0)
+        summary["upserted_count"] += result.get("nUpserted", 0)
+        summary["deleted_count"] += result.get("nRemoved", 0)
+        offset += len(batch)
+    return summary
+
+def update_document(collection_name: str, document_id: Union[str, ObjectId], updates: dict) -> bool:
+    """$set fields on one document by id (bumps updated_at); returns whether it was found"""
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    result = db[collection_name].update_one(
+        {"_id": _as_object_id(document_id)},
+        {"$set": {**updates, "updated_at": datetime.now(timezone.utc)}},
+    )
+    return result.matched_count > 0
+
+def update_documents(collection_name: str, updates: Iterable[Tuple[dict, dict]], chunk_size: int = 1000) -> dict:
+    """Apply many (filter, fields) pairs, each as a $set on the first matching document"""
+    now = datetime.now(timezone.utc)
+    requests = (UpdateOne(filt, {"$set": {**fields, "updated_at": now}}) for filt, fields in updates)
+    return _bulk_write(collection_name, requests, chunk_size)
+
+def upsert_documents(collection_name: str, data: Iterable[Union[BaseModel, dict]], key_fields: Sequence[str],
+                     chunk_size: int = 1000) -> dict:
+    """Insert or update documents matched on key_fields (created_at is only set on insert)
+
+    Documents missing a key field are reported in errors and skipped.
+    """
+    def requests():
+        for item in data:
+            doc = _timestamped(item)
+            created_at = doc.pop("created_at")
+            missing = [k for k in key_fields if k not in doc]
+            if missing:
+                yield f"Missing key field(s): {', '.join(missing)}"
+                continue
+            filt = {k: doc[k] for k in key_fields}
+            # _id is immutable: an upsert takes it from the filter, and it is never $set
+            doc.pop("_id", None)
+            yield UpdateOne(filt, {"$set": doc, "$setOnInsert": {"created_at": created_at}}, upsert=True)
+    return _bulk_write(collection_name, requests(), chunk_size)
+
+def delete_document(collection_name: str, document_id: Union[str, ObjectId]) -> bool:
+    """Delete one document by id; returns whether it existed"""
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    return db[collection_name].delete_one({"_id": _as_object_id(document_id)}).deleted_count > 0
+
+def delete_documents(collection_name: str, filters: Iterable[Union[dict, str, ObjectId]], chunk_size: int = 1000) -> dict:
+    """Delete by many ids (one document each) or filter dicts (every match)"""
+    requests = (
+        DeleteMany(f) if isinstance(f, dict) else DeleteOne({"_id": _as_object_id(f)})
+        for f in filters
+    )
+    return _bulk_write(collection_name, requests, chunk_size)
+
+def ensure_indexes(collection_name: str, indexes: List[IndexModel], drop_extra: bool = False,
+                   rebuild: bool = True) -> Dict[str, List[str]]:
+    """Reconcile a collection's indexes with the declared ones
+
+    Missing indexes are created, indexes whose definition changed are rebuilt
+    (only listed as outdated unless rebuild is set), and undeclared ones are
+    only dropped when drop_extra is set. Each index is created on its own, so
+    one that fails (listed as failed) does not block the others.
+    """
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    collection = db[collection_name]
+    existing = {ix["name"]: ix for ix in collection.list_indexes()}
+    declared = {ix.document["name"]: ix for ix in indexes}
+    summary: Dict[str, List[str]] = {
+        "created": [], "rebuilt": [], "outdated": [], "failed": [], "dropped": [], "extra": [],
+    }
+
+    for name, model in declared.items():
+        current = existing.get(name)
+        if current is None:
+            outcome = "created"
+        elif _same_index(current, model.document):
+            continue
+        elif rebuild:
+            collection.drop_index(name)
+            outcome = "rebuilt"
+        else:
+            summary["outdated"].append(name)
+            continue
+        try:
+            collection.create_indexes([model])
+        except OperationFailure as e:
+            summary["failed"].append(f"{name} ({e})")
+            continue
+        summary[outcome].append(name)
+
+    for name in existing:
+        if name == "_id_" or name in declared:
+            continue
+        if drop_extra:
+            collection.drop_index(name)
+            summary["dropped"].append(name)
+        else:
+            summary["extra"].append(name)
+    return summary
+
+def _same_index(current: dict, declared: dict) -> bool:
+    """Compare an existing index (from list_indexes) with an IndexModel document"""
+    if "textIndexVersion" in current:
+        # Text indexes are stored as {_fts, _ftsx} plus a weights map
+        declared_fields = {k for k, v in declared["key"].items() if v == "text"}
+        return set(current.get("weights", {})) == declared_fields
+    if list(current["key"].items()) != list(declared["key"].items()):
+        return False
+    options = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+    if not all(current.get(opt) == declared.get(opt) for opt in options):
+        return False
+    # The server expands collations with defaults, so only compare declared keys
+    collation = declared.get("collation") or {}
+    return all(current.get("collation", {}).get(k) == v for k, v in collation.items())
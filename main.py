@@ -1,14 +1,75 @@
+import asyncio
+import logging
 import os
+import re
+import time
+from datetime import timedelta
 from typing import List, Optional, Dict, Any
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, Field, ValidationError
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
 
-from database import db, create_document, get_documents
-from schemas import Restaurant, Review
+from database import (
+    get_db, get_async_db, close_clients, create_document_async, create_documents_async,
+    ensure_indexes, pool_stats, slow_query_log,
+)
+from schemas import Restaurant, Review, normalize_city
+from search_index import RestaurantIndex
+from ratings import rating_increment_pipeline
+from pagination import page_filter, paginate, split_page
+from responses import MongoJSONResponse
+from cache import TTLCache
+from singleflight import SingleFlight
+from synthetic import seed_synthetic
+from metrics import CONTENT_TYPE, MULTIPROC_DIR, REGISTRY, MetricsMiddleware, SharedMetrics, histogram_samples
+from monitoring import WAIT_BUCKETS, tag_commands
+from projections import (
+    RESTAURANT_FIELDS, RESTAURANT_PRESETS, REVIEW_FIELDS, REVIEW_PRESETS,
+    project_document, resolve_projection,
+)
+
+app = FastAPI(title="Local Eats Chat API", default_response_class=MongoJSONResponse)
+logger = logging.getLogger(__name__)
+
+# Per-worker in-memory index used by the chatbot search
+restaurant_index = RestaurantIndex()
+
+# The index reloads restaurants changed by other workers and clients every
+# INDEX_REFRESH_SECONDS and is rebuilt (dropping deleted ones) every
+# INDEX_REBUILD_SECONDS; chat falls back to MongoDB once it is older than INDEX_MAX_STALENESS
+INDEX_REFRESH_SECONDS = float(os.getenv("INDEX_REFRESH_SECONDS", 5))
+INDEX_REBUILD_SECONDS = float(os.getenv("INDEX_REBUILD_SECONDS", 600))
+INDEX_MAX_STALENESS = float(os.getenv("INDEX_MAX_STALENESS", 30))
+# /api/seed/synthetic writes thousands of documents, so it is off unless asked for
+SYNTHETIC_SEED_ENABLED = os.getenv("SYNTHETIC_SEED_ENABLED", "").lower() in ("1", "true", "yes")
+# Changes stamped this long before the watermark are re-read, to absorb clock skew between writers
+INDEX_REFRESH_OVERLAP = timedelta(seconds=30)
+
+# Assembled GET /api/restaurants/{id} payloads, tagged with the restaurant id.
+# A write invalidates its own worker's entries at once; other workers drop theirs
+# when their index refresh sees the restaurant change, so they may serve the old
+# payload for about INDEX_REFRESH_SECONDS (DETAIL_CACHE_TTL if refreshes fail)
+detail_cache = TTLCache(
+    maxsize=int(os.getenv("DETAIL_CACHE_SIZE", 1024)),
+    ttl=float(os.getenv("DETAIL_CACHE_TTL", 60)),
+)
+
+# Concurrent identical reads share one in-flight MongoDB call
+read_flight = SingleFlight()
 
-app = FastAPI(title="Local Eats Chat API")
+# Ranked /api/chat results keyed on the parsed filter. The index refresh clears it
+# when any restaurant changed (here or in another worker), so results lag writes
+# by up to INDEX_REFRESH_SECONDS while steady write traffic still gets cache hits
+chat_cache = TTLCache(
+    maxsize=int(os.getenv("CHAT_CACHE_SIZE", 2048)),
+    ttl=float(os.getenv("CHAT_CACHE_TTL", 30)),
+)
+# restaurant_index.version when chat_cache was last cleared
+chat_cache_version = None
 
 app.add_middleware(
     CORSMiddleware,
@@ -17,6 +78,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Utilities
 
@@ -31,13 +93,116 @@ def collection_name(model_cls) -> str:
     return model_cls.__name__.lower()
 
 
+def projection_or_400(fields: Optional[str], presets, allowed, required=()):
+    try:
+        return resolve_projection(fields, presets, allowed, required)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def backfill_city_keys(batch_size: int = 1000) -> int:
+    """Set city_key on restaurants written before it existed; returns the number updated"""
+    rest_col = collection_name(Restaurant)
+    updated = 0
+    batch = []
+    for doc in get_db()[rest_col].find({"city_key": {"$exists": False}}, {"city": 1}):
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"city_key": normalize_city(doc.get("city") or "")}}))
+        if len(batch) >= batch_size:
+            updated += get_db()[rest_col].bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += get_db()[rest_col].bulk_write(batch, ordered=False).modified_count
+    return updated
+
+
+def prepare_collections():
+    """Create missing indexes and backfill city_key
+
+    Changed index definitions are only reported: rebuilding them from every
+    worker at once is left to `python manage.py ensure-indexes`.
+    """
+    if get_db() is None:
+        return
+    for model in (Restaurant, Review):
+        name = collection_name(model)
+        try:
+            summary = ensure_indexes(name, model.indexes, rebuild=False)
+        except Exception:
+            logger.exception("Could not check indexes on %s", name)
+            continue
+        if summary["failed"]:
+            logger.error("Could not create indexes on %s: %s", name, "; ".join(summary["failed"]))
+        if summary["outdated"]:
+            logger.warning("Outdated indexes on %s (run manage.py ensure-indexes): %s",
+                           name, ", ".join(summary["outdated"]))
+    try:
+        backfill_city_keys()
+    except Exception:
+        logger.exception("city_key backfill failed")
+
+
+@app.on_event("startup")
+async def prepare_collections_on_startup():
+    await run_in_threadpool(prepare_collections)
+
+
+def refresh_restaurant_index(rebuild: bool = False):
+    """Rebuild the chat index when due, otherwise reload restaurants updated since its watermark"""
+    global chat_cache_version
+    rest_col = get_db()[collection_name(Restaurant)]
+    watermark = restaurant_index.read_started()
+    built_at = restaurant_index.built_at
+    if rebuild or built_at is None or restaurant_index.watermark is None \
+            or time.monotonic() - built_at >= INDEX_REBUILD_SECONDS:
+        restaurant_index.build(rest_col.find({}), watermark)
+        # Which restaurants other workers changed meanwhile is not known here
+        detail_cache.clear()
+    else:
+        since = restaurant_index.watermark - INDEX_REFRESH_OVERLAP
+        changed = restaurant_index.refresh(rest_col.find({"updated_at": {"$gte": since}}), watermark)
+        # Writers only invalidate their own worker's cache; this catches the other workers' writes
+        for doc_id in changed:
+            detail_cache.invalidate_tag(doc_id)
+    # Any change to the restaurants may change chat results, so they are dropped once per refresh
+    if restaurant_index.version != chat_cache_version:
+        chat_cache_version = restaurant_index.version
+        chat_cache.clear()
+
+
+async def keep_index_fresh():
+    # Until the first build succeeds chatbot_search falls back to MongoDB
+    while True:
+        try:
+            await run_in_threadpool(refresh_restaurant_index)
+        except Exception:
+            logger.exception("Restaurant index refresh failed")
+        await asyncio.sleep(INDEX_REFRESH_SECONDS)
+
+
+@app.on_event("startup")
+async def start_index_refresh():
+    if get_db() is not None:
+        app.state.index_refresh = asyncio.create_task(keep_index_fresh())
+
+
+@app.on_event("shutdown")
+async def close_database():
+    task = getattr(app.state, "index_refresh", None)
+    if task is not None:
+        task.cancel()
+    if shared_metrics is not None:
+        # Keep the counts since the last snapshot when the worker is recycled
+        shared_metrics.write()
+    close_clients()
+
+
 @app.get("/")
-def root():
+async def root():
     return {"message": "Local Eats Chat API running"}
 
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -47,13 +212,14 @@ def test_database():
         "collections": []
     }
     try:
-        if db is not None:
+        adb = get_async_db()
+        if adb is not None:
             response["database"] = "✅ Available"
             response["database_url"] = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
-            response["database_name"] = db.name if hasattr(db, 'name') else "✅ Connected"
+            response["database_name"] = adb.name if hasattr(adb, 'name') else "✅ Connected"
             response["connection_status"] = "Connected"
             try:
-                collections = db.list_collection_names()
+                collections = await adb.list_collection_names()
                 response["collections"] = collections[:10]
                 response["database"] = "✅ Connected & Working"
             except Exception as e:
@@ -65,11 +231,105 @@ def test_database():
     return response
 
 
+@app.get("/api/admin/cache")
+async def cache_stats():
+    """Hit rate, size and eviction counts of the in-process caches"""
+    return {
+        "restaurant_detail": detail_cache.stats(),
+        "chat": chat_cache.stats(),
+        "single_flight": read_flight.stats(),
+    }
+
+
+@app.get("/api/admin/pool")
+async def connection_pool_stats():
+    """Connection pool metrics: checkout waits, connections in use and churn"""
+    return pool_stats()
+
+
+# Plain JSON: query shapes contain "_id" keys that must not be renamed
+@app.get("/api/admin/slow-queries", response_class=JSONResponse)
+async def slow_queries(
+    limit: int = Query(50, ge=1, le=1000),
+    collection: Optional[str] = None,
+    route: Optional[str] = None,
+    explained: bool = False,
+):
+    """Most recent reads slower than SLOW_QUERY_MS, with their shape and explain summary"""
+    entries = await run_in_threadpool(
+        slow_query_log.read, limit, collection=collection, route=route, explained_only=explained)
+    return {
+        "threshold_ms": slow_query_log.threshold_ms,
+        "dropped": slow_query_log.dropped,
+        "entries": entries,
+    }
+
+
+def app_metrics():
+    """Connection pool and cache counters, read when /metrics is scraped"""
+    pools = pool_stats()
+    for name, key, kind, doc in (
+        ("mongo_pool_connections_open", "connections_open", "gauge", "Open MongoDB connections"),
+        ("mongo_pool_connections_in_use", "connections_in_use", "gauge", "MongoDB connections checked out"),
+        ("mongo_pool_checkouts_total", "checkouts", "counter", "MongoDB connection checkouts"),
+        ("mongo_pool_cleared_total", "pools_cleared", "counter", "MongoDB connection pool clears"),
+    ):
+        yield name, kind, doc, [("", {"client": c}, stats[key]) for c, stats in pools.items()]
+    yield "mongo_pool_checkout_failures_total", "counter", "Failed MongoDB connection checkouts", [
+        ("", {"client": c, "reason": reason}, n)
+        for c, stats in pools.items() for reason, n in stats["checkout_failures"].items()
+    ]
+    yield "mongo_pool_checkout_wait_seconds", "histogram", "Time spent waiting for a MongoDB connection", [
+        row for c, stats in pools.items()
+        for row in histogram_samples(
+            WAIT_BUCKETS, list(stats["checkout_wait"]["buckets"].values()),
+            stats["checkout_wait"]["sum_seconds"], {"client": c})
+    ]
+
+    caches = {"restaurant_detail": detail_cache.stats(), "chat": chat_cache.stats()}
+    for name, key, kind, doc in (
+        ("cache_hits_total", "hits", "counter", "In-process cache hits"),
+        ("cache_misses_total", "misses", "counter", "In-process cache misses"),
+        ("cache_evictions_total", "evictions", "counter", "In-process cache LRU evictions"),
+        ("cache_entries", "size", "gauge", "In-process cache entries"),
+    ):
+        yield name, kind, doc, [("", {"cache": c}, stats[key]) for c, stats in caches.items()]
+    flight = read_flight.stats()
+    yield "single_flight_shared_total", "counter", "Reads answered by another request's in-flight query", [
+        ("", {}, flight["shared"])]
+
+
+REGISTRY.add_collector(app_metrics)
+
+# Every worker has its own registry; with several workers only the shared
+# directory gives a scrape the totals instead of one worker's counters
+shared_metrics = SharedMetrics(REGISTRY, MULTIPROC_DIR) if MULTIPROC_DIR else None
+
+
+@app.on_event("startup")
+async def start_metrics_snapshots():
+    if shared_metrics is not None:
+        os.makedirs(shared_metrics.directory, exist_ok=True)
+        shared_metrics.start()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Request, connection pool and cache metrics in Prometheus text format
+
+    Summed over all workers when METRICS_MULTIPROC_DIR is set; otherwise only
+    the worker that answers, which is meaningful with a single worker only.
+    """
+    if shared_metrics is not None:
+        return Response(await run_in_threadpool(shared_metrics.render), media_type=CONTENT_TYPE)
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 # Seed minimal demo data if empty
 @app.post("/api/seed")
-def seed_demo():
+async def seed_demo():
     rest_col = collection_name(Restaurant)
-    if db[rest_col].count_documents({}) > 0:
+    if await get_async_db()[rest_col].count_documents({}) > 0:
         return {"status": "ok", "message": "Already seeded"}
 
     demo = [
@@ -113,28 +373,95 @@ def seed_demo():
             "rating_count": 210
         },
     ]
-    ids = []
     for d in demo:
-        rid = create_document(rest_col, d)
-        ids.append(rid)
-    return {"status": "ok", "inserted": ids}
+        d["city_key"] = normalize_city(d["city"])
+    result = await create_documents_async(rest_col, demo)
+    for d, rid in zip(demo, result["inserted_ids"]):
+        restaurant_index.upsert({**d, "_id": ObjectId(rid)})
+    chat_cache.clear()
+    return {"status": "ok", "inserted": result["inserted_ids"]}
+
+
+@app.post("/api/seed/synthetic")
+async def seed_synthetic_data(
+    restaurants: int = Query(1000, ge=1, le=20_000),
+    reviews: int = Query(20_000, ge=0, le=500_000),
+    seed: int = 0,
+):
+    """Small synthetic dataset for local load testing (use manage.py seed for larger ones)
+
+    Disabled unless SYNTHETIC_SEED_ENABLED is set.
+    """
+    if not SYNTHETIC_SEED_ENABLED:
+        raise HTTPException(403, "Synthetic seeding is disabled; set SYNTHETIC_SEED_ENABLED=1 to allow it")
+    summary = await run_in_threadpool(seed_synthetic, restaurants, reviews, workers=1, seed=seed)
+    await run_in_threadpool(refresh_restaurant_index, True)
+    detail_cache.clear()
+    chat_cache.clear()
+    return {"status": "ok", **summary}
 
 
 # Simple search endpoint used by the chatbot
 class ChatQuery(BaseModel):
     query: str
     city: Optional[str] = None
+    # Opt in to case-insensitive substring matching instead of ranked word search
+    substring: bool = False
+    # Preset name or comma separated field list for the returned restaurants
+    fields: Optional[str] = None
+
+
+def chat_filter(city: str, cuisines: List[str], dishes: List[str], tags: List[str],
+                price_level: Optional[int], takeaway: Optional[bool]) -> Dict[str, Any]:
+    """MongoDB filter for the structured part of a chat query"""
+    filt: Dict[str, Any] = {}
+    if city:
+        filt["city_key"] = normalize_city(city)
+    if cuisines:
+        filt["cuisine"] = {"$in": sorted(set(cuisines))}
+    if dishes:
+        filt["dishes"] = {"$in": sorted(set(dishes))}
+    if tags:
+        filt["tags"] = {"$in": sorted(set(tags))}
+    if price_level:
+        filt["price_level"] = {"$lte": price_level}
+    if takeaway is not None:
+        filt["takeaway"] = takeaway
+    return filt
+
+
+async def mongo_text_search(rest_col: str, q: str, substring: bool = False,
+                            projection: Optional[Dict[str, int]] = None) -> List[dict]:
+    """Text match in name/dishes/cuisine/tags, for substring queries or while the in-memory index is unusable"""
+    if substring:
+        pattern = re.escape(q.strip())
+        with tag_commands("chat_regex_fallback"):
+            return await get_async_db()[rest_col].find({
+                "$or": [
+                    {"name": {"$regex": pattern, "$options": "i"}},
+                    {"dishes": {"$elemMatch": {"$regex": pattern, "$options": "i"}}},
+                    {"cuisine": {"$elemMatch": {"$regex": pattern, "$options": "i"}}},
+                    {"tags": {"$elemMatch": {"$regex": pattern, "$options": "i"}}}
+                ]
+            }, projection).limit(12).to_list(12)
+    with tag_commands("chat_text_search"):
+        results = await get_async_db()[rest_col].find(
+            {"$text": {"$search": q}},
+            {**(projection or {}), "score": {"$meta": "textScore"}},
+        ).sort([("score", {"$meta": "textScore"})]).limit(12).to_list(12)
+    for r in results:
+        r.pop("score", None)
+    return results
 
 
 @app.post("/api/chat")
-def chatbot_search(body: ChatQuery):
+async def chatbot_search(body: ChatQuery):
     q = (body.query or "").lower()
     city = (body.city or "").strip()
     rest_col = collection_name(Restaurant)
-
-    filt: Dict[str, Any] = {}
-    if city:
-        filt["city"] = {"$regex": f"^{city}$", "$options": "i"}
+    # name and rating_avg are needed to compose the answer
+    projection = projection_or_400(body.fields, RESTAURANT_PRESETS, RESTAURANT_FIELDS)
+    query_projection = {**projection, "name": 1, "rating_avg": 1} if projection is not None else None
 
     # Heuristic parsing: cuisine keywords, price, takeaway, dish names
     cuisines = []
@@ -159,109 +486,365 @@ def chatbot_search(body: ChatQuery):
         if w in cuisine_keywords:
             cuisines.append(w.replace('taco','mexican'))
 
-    if cuisines:
-        filt["cuisine"] = {"$in": list(set(cuisines))}
-    if dishes:
-        filt["dishes"] = {"$in": list(set(dishes))}
-    if tags:
-        filt["tags"] = {"$in": list(set(tags))}
-    if price_level:
-        filt["price_level"] = {"$lte": price_level}
-    if takeaway is not None:
-        filt["takeaway"] = takeaway
-
-    results = list(db[rest_col].find(filt).limit(12))
+    # A stale or empty index (e.g. other writers, or still building) defers to MongoDB
+    use_index = restaurant_index.usable(INDEX_MAX_STALENESS)
+
+    # Different phrasings that parse to the same filter share one cache entry
+    filt = chat_filter(city, cuisines, dishes, tags, price_level, takeaway)
+    filter_key = ("filter", repr(sorted(filt.items())), body.fields)
+    # Taken before reading, so results computed across a refresh's clear are not re-cached
+    token = chat_cache.token()
+    results = chat_cache.get(filter_key)
+    if results is None:
+        if use_index:
+            results = restaurant_index.search(
+                city=city or None,
+                cuisines=list(set(cuisines)),
+                tags=list(set(tags)),
+                price_level=price_level,
+                takeaway=takeaway,
+                limit=12,
+            )
+        else:
+            results = await get_async_db()[rest_col].find(filt, query_projection).limit(12).to_list(12)
+        chat_cache.set(filter_key, results, token=token)
 
-    # Fallback to any text match in name/dishes/tags if empty
+    # Fallback to a text match in name/dishes/cuisine/tags if empty
     if not results and q:
-        results = list(db[rest_col].find({
-            "$or": [
-                {"name": {"$regex": q, "$options": "i"}},
-                {"dishes": {"$elemMatch": {"$regex": q, "$options": "i"}}},
-                {"cuisine": {"$elemMatch": {"$regex": q, "$options": "i"}}},
-                {"tags": {"$elemMatch": {"$regex": q, "$options": "i"}}}
-            ]
-        }).limit(12))
-
-    def transform(doc):
-        doc["id"] = str(doc.pop("_id"))
-        return doc
-
-    payload = [transform(r) for r in results]
-
-    if not payload:
+        text_key = ("text", q.strip(), body.substring, body.fields)
+        results = chat_cache.get(text_key)
+        if results is None:
+            # Substring matching is opt-in and answered by MongoDB's $regex, so the
+            # index does not have to keep n-gram postings in every worker
+            if use_index and not body.substring:
+                results = restaurant_index.rank_text(q, limit=12)
+            else:
+                results = await mongo_text_search(rest_col, q, body.substring, query_projection)
+            chat_cache.set(text_key, results, token=token)
+
+    if not results:
         return {
             "answer": "I couldn't find an exact match. Try mentioning a cuisine, dish, price range (cheap/fancy), or city.",
             "results": []
         }
 
     # Compose a friendly answer
-    top = sorted(payload, key=lambda x: x.get("rating_avg", 0), reverse=True)[:3]
+    top = sorted(results, key=lambda x: x.get("rating_avg", 0), reverse=True)[:3]
     names = ", ".join([t["name"] for t in top])
     city_txt = f" in {city}" if city else ""
     answer = f"Top picks{city_txt}: {names}. Tap a card to see details and reviews."
 
-    return {"answer": answer, "results": payload}
+    if projection is not None:
+        results = [project_document(r, projection) for r in results]
+    return MongoJSONResponse({"answer": answer, "results": results})
 
 
 # Create a review and update restaurant aggregates
 class ReviewCreate(BaseModel):
     restaurant_id: str
     user_name: str
-    rating: int
+    rating: int = Field(..., ge=1, le=5)
     comment: Optional[str] = None
     photos: Optional[List[str]] = None
 
 
 @app.post("/api/reviews")
-def add_review(body: ReviewCreate):
+async def add_review(body: ReviewCreate):
     rest_col = collection_name(Restaurant)
     rev_col = collection_name(Review)
 
-    # Insert review
-    rid = create_document(rev_col, {
+    restaurant_oid = oid(body.restaurant_id)
+    adb = get_async_db()
+
+    # Insert the review first, so the aggregates never count a review that
+    # failed to insert; it is removed again if the restaurant does not exist
+    rid = await create_document_async(rev_col, {
         "restaurant_id": body.restaurant_id,
         "user_name": body.user_name,
         "rating": body.rating,
         "comment": body.comment,
         "photos": body.photos or []
     })
+    try:
+        rest = await adb[rest_col].find_one_and_update(
+            {"_id": restaurant_oid},
+            rating_increment_pipeline(body.rating),
+            return_document=ReturnDocument.AFTER,
+        )
+    except Exception:
+        await adb[rev_col].delete_one({"_id": ObjectId(rid)})
+        raise
+    if not rest:
+        await adb[rev_col].delete_one({"_id": ObjectId(rid)})
+        raise HTTPException(404, "Restaurant not found")
 
-    # Recompute rating aggregates
-    from statistics import mean
-    reviews = list(db[rev_col].find({"restaurant_id": body.restaurant_id}))
-    ratings = [r.get("rating", 0) for r in reviews]
-    avg = round(mean(ratings), 1) if ratings else 0
-    count = len(ratings)
-    db[rest_col].update_one({"_id": oid(body.restaurant_id)}, {"$set": {"rating_avg": avg, "rating_count": count}})
+    avg = rest["rating_avg"]
+    count = rest["rating_count"]
+    # The whole document, so the index also learns restaurants it has not loaded yet
+    restaurant_index.upsert(rest)
+    detail_cache.invalidate_tag(body.restaurant_id)
 
     return {"status": "ok", "review_id": rid, "rating_avg": avg, "rating_count": count}
 
 
+# Errors listed in an import response; the rest are only counted
+MAX_IMPORT_ERRORS = 100
+
+
+async def ndjson_lines(request: Request):
+    """Yield (line_number, line) from a streamed request body, skipping blank lines"""
+    buffer = b""
+    line_no = 0
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield line_no, line
+    if buffer.strip():
+        yield line_no + 1, buffer
+
+
+@app.post("/api/reviews/import")
+async def import_reviews(request: Request, batch_size: int = Query(1000, ge=1, le=10000)):
+    """Bulk-load newline-delimited JSON reviews (one schemas.Review per line)
+
+    Valid lines are inserted in batches as the body streams in. Lines for
+    restaurants that do not exist are rejected. Once the body has been read, the
+    inserted ratings are added to each affected restaurant's aggregates in one
+    update, the same way add_review does.
+    """
+    rev_col = collection_name(Review)
+    rest_col = collection_name(Restaurant)
+    adb = get_async_db()
+    summary = {"received": 0, "inserted": 0, "failed": 0, "errors": []}
+    # restaurant_id -> [rating sum, count] of the inserted reviews
+    totals: Dict[str, List[int]] = {}
+    known, missing = set(), set()
+    batch: List[tuple] = []
+
+    def reject(line_no: int, message: str):
+        summary["failed"] += 1
+        if len(summary["errors"]) < MAX_IMPORT_ERRORS:
+            summary["errors"].append({"line": line_no, "error": message})
+
+    async def flush():
+        unchecked = {doc["restaurant_id"] for _, doc in batch} - known - missing
+        if unchecked:
+            found = await adb[rest_col].find(
+                {"_id": {"$in": [ObjectId(r) for r in unchecked]}}, {"_id": 1}).to_list(None)
+            known.update(str(d["_id"]) for d in found)
+            missing.update(unchecked - known)
+        accepted = []
+        for line_no, doc in batch:
+            if doc["restaurant_id"] in missing:
+                reject(line_no, "Restaurant not found")
+            else:
+                accepted.append((line_no, doc))
+        batch.clear()
+        if not accepted:
+            return
+
+        result = await create_documents_async(rev_col, [doc for _, doc in accepted], chunk_size=batch_size)
+        summary["inserted"] += result["inserted_count"]
+        failed = set()
+        for error in result["errors"]:
+            for e in error["errors"]:
+                failed.add(e["index"])
+                reject(accepted[e["index"]][0], e["message"])
+        for i, (_, doc) in enumerate(accepted):
+            if i not in failed:
+                total = totals.setdefault(doc["restaurant_id"], [0, 0])
+                total[0] += doc["rating"]
+                total[1] += 1
+
+    try:
+        async for line_no, line in ndjson_lines(request):
+            summary["received"] += 1
+            try:
+                review = Review.model_validate_json(line)
+            except ValidationError as e:
+                error = e.errors(include_url=False)[0]
+                loc = ".".join(str(part) for part in error["loc"])
+                reject(line_no, f"{loc}: {error['msg']}" if loc else error["msg"])
+                continue
+            if not ObjectId.is_valid(review.restaurant_id):
+                reject(line_no, "Invalid restaurant_id")
+                continue
+            doc = review.model_dump(mode="json")
+            # Keep the partner's timestamp as a datetime, for the newest-first review order
+            doc["created_at"] = review.created_at
+            batch.append((line_no, doc))
+            if len(batch) >= batch_size:
+                await flush()
+        if batch:
+            await flush()
+    finally:
+        # Also when the body breaks off, so every inserted review is counted
+        updates = [
+            UpdateOne({"_id": ObjectId(rid)}, rating_increment_pipeline(rating_sum, count))
+            for rid, (rating_sum, count) in totals.items()
+        ]
+        for start in range(0, len(updates), batch_size):
+            await adb[rest_col].bulk_write(updates[start:start + batch_size], ordered=False)
+
+    updated_count = 0
+    if totals:
+        updated = adb[rest_col].find({"_id": {"$in": [ObjectId(r) for r in totals]}})
+        async for rest in updated:
+            updated_count += 1
+            restaurant_index.upsert(rest)
+            detail_cache.invalidate_tag(str(rest["_id"]))
+
+    return {"status": "ok", "restaurants_updated": updated_count, **summary}
+
+
+# Keyset sort orders for list_restaurants; each ends with _id so cursors are unique
+RESTAURANT_SORTS = {
+    "id": [("_id", 1)],
+    "rating": [("rating_avg", -1), ("_id", -1)],
+}
+
+
 @app.get("/api/restaurants")
-def list_restaurants(city: Optional[str] = None):
+async def list_restaurants(
+    city: Optional[str] = None,
+    sort: str = Query("id", pattern="^(id|rating)$"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
     rest_col = collection_name(Restaurant)
+    order = RESTAURANT_SORTS[sort]
+    projection = projection_or_400(fields, RESTAURANT_PRESETS, RESTAURANT_FIELDS, [f for f, _ in order])
     filt: Dict[str, Any] = {}
     if city:
-        filt["city"] = {"$regex": f"^{city}$", "$options": "i"}
-    items = list(db[rest_col].find(filt).limit(50))
-    for it in items:
-        it["id"] = str(it.pop("_id"))
-    return items
+        filt["city_key"] = normalize_city(city)
+    key = ("restaurants", filt.get("city_key"), sort, limit, cursor, fields)
+    try:
+        items, next_cursor = await read_flight.do(key, lambda: paginate(
+            get_async_db()[rest_col], filt, order, limit, cursor, scope=sort, projection=projection))
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+    return MongoJSONResponse({"items": items, "next_cursor": next_cursor})
 
 
-@app.get("/api/restaurants/{restaurant_id}")
-def get_restaurant(restaurant_id: str):
-    rest_col = collection_name(Restaurant)
+# Newest first; cursors are scoped to one restaurant and shared by both review endpoints
+REVIEW_SORT = [("created_at", -1), ("_id", -1)]
+
+
+async def review_page(restaurant_id: str, limit: int, cursor: Optional[str] = None, fields: Optional[str] = None):
     rev_col = collection_name(Review)
-    doc = db[rest_col].find_one({"_id": oid(restaurant_id)})
+    projection = projection_or_400(fields, REVIEW_PRESETS, REVIEW_FIELDS, [f for f, _ in REVIEW_SORT])
+    key = ("reviews", restaurant_id, limit, cursor, fields)
+    try:
+        reviews, next_cursor = await read_flight.do(key, lambda: paginate(
+            get_async_db()[rev_col], {"restaurant_id": restaurant_id}, REVIEW_SORT,
+            limit, cursor, scope=restaurant_id, projection=projection))
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+    return reviews, next_cursor
+
+
+async def fetch_detail_split(restaurant_id: str, reviews_limit: int,
+                             reviews_cursor: Optional[str], fields: Optional[str]) -> dict:
+    """Restaurant and one page of reviews in two queries (find_one, then find)"""
+    rest_col = collection_name(Restaurant)
+    projection = projection_or_400(fields, RESTAURANT_PRESETS, RESTAURANT_FIELDS)
+    review_fields = fields if fields in REVIEW_PRESETS else None
+    doc = await get_async_db()[rest_col].find_one({"_id": oid(restaurant_id)}, projection)
     if not doc:
         raise HTTPException(404, "Restaurant not found")
-    doc["id"] = str(doc.pop("_id"))
-    reviews = list(db[rev_col].find({"restaurant_id": restaurant_id}).sort("created_at", -1).limit(20))
-    for r in reviews:
-        r["id"] = str(r.pop("_id"))
-    return {"restaurant": doc, "reviews": reviews}
+    reviews, next_cursor = [], None
+    if reviews_limit:
+        reviews, next_cursor = await review_page(restaurant_id, reviews_limit, reviews_cursor, review_fields)
+    return {"restaurant": doc, "reviews": reviews, "reviews_next_cursor": next_cursor}
+
+
+async def fetch_detail_lookup(restaurant_id: str, reviews_limit: int,
+                              reviews_cursor: Optional[str], fields: Optional[str]) -> dict:
+    """Restaurant and one page of reviews in a single $match + $lookup aggregation"""
+    rest_col = collection_name(Restaurant)
+    rev_col = collection_name(Review)
+    projection = projection_or_400(fields, RESTAURANT_PRESETS, RESTAURANT_FIELDS)
+    review_projection = projection_or_400(fields if fields in REVIEW_PRESETS else None, REVIEW_PRESETS,
+                                          REVIEW_FIELDS, [f for f, _ in REVIEW_SORT])
+    try:
+        review_filter = page_filter({"restaurant_id": restaurant_id}, REVIEW_SORT, reviews_cursor, scope=restaurant_id)
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+
+    pipeline: List[Dict[str, Any]] = [{"$match": {"_id": oid(restaurant_id)}}, {"$limit": 1}]
+    if projection is not None:
+        pipeline.append({"$project": projection})
+    if reviews_limit:
+        # Uncorrelated sub-pipeline, so it can use the (restaurant_id, created_at, _id) index
+        reviews_pipeline = [
+            {"$match": review_filter},
+            {"$sort": dict(REVIEW_SORT)},
+            {"$limit": reviews_limit + 1},
+        ]
+        if review_projection is not None:
+            reviews_pipeline.append({"$project": review_projection})
+        pipeline.append({"$lookup": {"from": rev_col, "pipeline": reviews_pipeline, "as": "_reviews"}})
+
+    docs = await get_async_db()[rest_col].aggregate(pipeline).to_list(1)
+    if not docs:
+        raise HTTPException(404, "Restaurant not found")
+    doc = docs[0]
+    reviews, next_cursor = split_page(doc.pop("_reviews", []), reviews_limit, REVIEW_SORT, scope=restaurant_id)
+    return {"restaurant": doc, "reviews": reviews, "reviews_next_cursor": next_cursor}
+
+
+# "split" (find_one + find) or "lookup" (one aggregation round trip)
+DETAIL_FETCH_MODE = os.getenv("DETAIL_FETCH_MODE", "split")
+
+
+async def load_restaurant_detail(restaurant_id: str, reviews_limit: int,
+                                 reviews_cursor: Optional[str], fields: Optional[str]) -> dict:
+    fetch = fetch_detail_lookup if DETAIL_FETCH_MODE == "lookup" else fetch_detail_split
+    # Taken before reading, so a review written meanwhile keeps this payload out of the cache
+    token = detail_cache.token([restaurant_id])
+    payload = await fetch(restaurant_id, reviews_limit, reviews_cursor, fields)
+    if reviews_cursor is None:
+        detail_cache.set((restaurant_id, reviews_limit, fields), payload, tags=[restaurant_id], token=token)
+    return payload
+
+
+@app.get("/api/restaurants/{restaurant_id}")
+async def get_restaurant(
+    restaurant_id: str,
+    reviews_limit: int = Query(10, ge=0, le=100),
+    reviews_cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """`fields` applies to the restaurant; a preset name also selects the matching review preset
+
+    First pages (no reviews_cursor) are served from detail_cache; concurrent
+    misses for the same key share one load.
+    """
+    if reviews_cursor is None:
+        payload = detail_cache.get((restaurant_id, reviews_limit, fields))
+        if payload is not None:
+            return MongoJSONResponse(payload)
+
+    key = ("detail", restaurant_id, reviews_limit, reviews_cursor, fields)
+    payload = await read_flight.do(key, lambda: load_restaurant_detail(
+        restaurant_id, reviews_limit, reviews_cursor, fields))
+    return MongoJSONResponse(payload)
+
+
+@app.get("/api/restaurants/{restaurant_id}/reviews")
+async def list_reviews(
+    restaurant_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    oid(restaurant_id)
+    items, next_cursor = await review_page(restaurant_id, limit, cursor, fields)
+    return MongoJSONResponse({"items": items, "next_cursor": next_cursor})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,73 @@
+"""
+Management Commands
+
+Usage:
+    python manage.py ensure-indexes [--drop-extra]
+    python manage.py backfill-city-keys
+    python manage.py seed [--restaurants N] [--reviews M] [--workers W] [--batch-size B] [--seed S]
+"""
+
+import argparse
+import os
+
+from database import ensure_indexes
+from main import backfill_city_keys, collection_name
+from schemas import Restaurant, Review
+from synthetic import seed_synthetic
+
+MODELS = [Restaurant, Review]
+
+
+def cmd_ensure_indexes(args):
+    """Reconcile the indexes declared in schemas.py with the database"""
+    for model in MODELS:
+        name = collection_name(model)
+        summary = ensure_indexes(name, model.indexes, drop_extra=args.drop_extra)
+        changes = ", ".join(f"{k}: {', '.join(v)}" for k, v in summary.items() if v) or "up to date"
+        print(f"{name}: {changes}")
+
+
+def cmd_backfill_city_keys(args):
+    """Set city_key on restaurants that do not have one yet"""
+    print(f"restaurant: {backfill_city_keys()} updated")
+
+
+def cmd_seed(args):
+    """Bulk-insert synthetic restaurants and reviews with Zipf-skewed distributions"""
+    step = max(args.batch_size * args.workers, 1)
+
+    def progress(name, inserted):
+        if inserted % step < args.batch_size:
+            print(f"{name}: {inserted} inserted", flush=True)
+
+    summary = seed_synthetic(args.restaurants, args.reviews, workers=args.workers, batch_size=args.batch_size,
+                             seed=args.seed, zipf_s=args.zipf, progress=progress, rebuild_indexes=True)
+    print(", ".join(f"{k}: {v}" for k, v in summary.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("ensure-indexes", help=cmd_ensure_indexes.__doc__)
+    p.add_argument("--drop-extra", action="store_true", help="Drop indexes not declared in schemas.py")
+    p.set_defaults(func=cmd_ensure_indexes)
+
+    p = commands.add_parser("backfill-city-keys", help=cmd_backfill_city_keys.__doc__)
+    p.set_defaults(func=cmd_backfill_city_keys)
+
+    p = commands.add_parser("seed", help=cmd_seed.__doc__)
+    p.add_argument("--restaurants", type=int, default=10_000)
+    p.add_argument("--reviews", type=int, default=1_000_000)
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Insert processes (default: CPU count)")
+    p.add_argument("--batch-size", type=int, default=5000)
+    p.add_argument("--seed", type=int, default=0, help="Random seed, for repeatable datasets")
+    p.add_argument("--zipf", type=float, default=1.0, help="Skew of reviews per restaurant")
+    p.set_defaults(func=cmd_seed)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""
+Prometheus Metrics
+
+A small in-process registry of counters, gauges and histograms rendered in the
+Prometheus text exposition format, plus a pure ASGI middleware that records
+request count, in-flight requests, errors and latency per route template.
+
+Each worker process keeps its own registry. A scrape reaches whichever worker
+accepts the connection, so with several gunicorn workers the counters would
+jump between unrelated processes (read by Prometheus as resets). Setting
+METRICS_MULTIPROC_DIR to a directory shared by the workers fixes that: each
+worker writes a snapshot of its registry there every METRICS_SNAPSHOT_SECONDS
+and /metrics reports their sum (see SharedMetrics). Without it, /metrics is
+only meaningful with a single worker.
+"""
+
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# ASGI scope of the request being handled, so code below the router (such as
+# MongoDB command listeners) can tell which route it is working for
+request_scope: ContextVar = ContextVar("request_scope", default=None)
+
+# (name suffix, labels, value) rows of one metric family
+Samples = Iterable[Tuple[str, Dict[str, str], float]]
+# (name, type, help, samples)
+Family = Tuple[str, str, str, Samples]
+# Collectors return families, read at scrape time
+Collector = Callable[[], Iterable[Family]]
+
+# Directory shared by all worker processes; when set, /metrics reports their sum
+MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+SNAPSHOT_SECONDS = float(os.getenv("METRICS_SNAPSHOT_SECONDS", "5"))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def histogram_samples(bounds: Sequence[float], buckets: Sequence[int], total: float,
+                      labels: Dict[str, str] = None) -> List[Tuple[str, Dict[str, str], float]]:
+    """Rows for one histogram series from per-bucket (non-cumulative) counts
+
+    buckets has one more entry than bounds, for observations above the last bound.
+    """
+    labels = labels or {}
+    rows, cumulative = [], 0
+    for bound, count in zip(list(bounds) + [float("inf")], buckets):
+        cumulative += count
+        rows.append(("_bucket", {**labels, "le": _format_value(float(bound))}, cumulative))
+    rows.append(("_sum", labels, total))
+    rows.append(("_count", labels, cumulative))
+    return rows
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Sequence[str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(v) for v in labels)
+
+    def samples(self) -> Samples:
+        with self._lock:
+            items = list(self._values.items())
+        return [("", dict(zip(self.labelnames, key)), value) for key, value in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labels: str, amount: float = 1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self) -> Samples:
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        rows = []
+        for key, counts, total in items:
+            rows.extend(histogram_samples(self.buckets, counts, total, dict(zip(self.labelnames, key))))
+        return rows
+
+
+class Registry:
+    """Metrics and scrape-time collectors rendered together by render()"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Collector] = []
+
+    def _register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def collect(self) -> List[Family]:
+        families = [(m.name, m.kind, m.documentation, m.samples()) for m in self._metrics]
+        for collector in self._collectors:
+            families.extend((name, kind, doc, list(samples)) for name, kind, doc, samples in collector())
+        return families
+
+    def render(self) -> str:
+        return render_families(self.collect())
+
+
+def render_families(families: Iterable[Family]) -> str:
+    lines = []
+    for name, kind, documentation, samples in families:
+        lines.append(f"# HELP {name} {_escape(documentation)}")
+        lines.append(f"# TYPE {name} {kind}")
+        for suffix, labels, value in samples:
+            lines.append(f"{name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def merge_families(snapshots: Iterable[List[Family]]) -> List[Family]:
+    """Sum samples with the same name, suffix and labels across snapshots"""
+    merged: Dict[str, tuple] = {}
+    for families in snapshots:
+        for name, kind, documentation, samples in families:
+            rows = merged.setdefault(name, (kind, documentation, {}))[2]
+            for suffix, labels, value in samples:
+                key = (suffix, tuple(sorted(labels.items())))
+                if key in rows:
+                    rows[key][1] += value
+                else:
+                    rows[key] = [labels, value]
+    return [
+        (name, kind, documentation, [(suffix, labels, value) for (suffix, _), (labels, value) in rows.items()])
+        for name, (kind, documentation, rows) in merged.items()
+    ]
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedMetrics:
+    """Registry snapshots of every worker in a shared directory, summed when scraped
+
+    Each process writes <pid>.json every interval seconds (and before it
+    renders). Counters and histograms of exited workers are folded into
+    exited.json, so totals never go backwards when gunicorn recycles a
+    worker; their gauges are dropped. The directory should be emptied when
+    the server starts.
+    """
+
+    EXITED = "exited.json"
+
+    def __init__(self, registry: Registry, directory: str, interval: float = SNAPSHOT_SECONDS):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start this process's snapshot thread (threads do not survive fork, so once per worker)"""
+        with self._lock:
+            if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+                self._worker_pid = os.getpid()
+                self._worker = threading.Thread(target=self._run, name="metrics-snapshot", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.write()
+            except Exception:
+                # A full disk must not stop the worker; the next snapshot retries
+                pass
+            time.sleep(self.interval)
+
+    def write(self):
+        """Replace this process's snapshot with the current registry contents"""
+        self._dump(os.path.join(self.directory, f"{os.getpid()}.json"), self.registry.collect())
+
+    def render(self) -> str:
+        self.write()
+        snapshots = []
+        with self._exclusive():
+            for entry in os.listdir(self.directory):
+                pid, ext = os.path.splitext(entry)
+                if ext != ".json" or not pid.isdigit():
+                    continue
+                path = os.path.join(self.directory, entry)
+                families = self._load(path)
+                if _alive(int(pid)):
+                    snapshots.append(families)
+                else:
+                    self._fold_exited(families)
+                    os.remove(path)
+            snapshots.append(self._load(os.path.join(self.directory, self.EXITED)))
+        return render_families(merge_families(snapshots))
+
+    def _fold_exited(self, families: List[Family]):
+        path = os.path.join(self.directory, self.EXITED)
+        kept = [family for family in families if family[1] != "gauge"]
+        self._dump(path, merge_families([self._load(path), kept]))
+
+    @contextmanager
+    def _exclusive(self):
+        # Only one worker folds exited snapshots at a time
+        with open(os.path.join(self.directory, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    @staticmethod
+    def _load(path: str) -> List[Family]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return [tuple(family) for family in json.load(f)]
+        except (FileNotFoundError, ValueError):
+            return []
+
+    @staticmethod
+    def _dump(path: str, families: List[Family]):
+        # Written beside the target and renamed, so readers never see half a file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(families, f)
+        os.replace(tmp, path)
+
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter("http_requests_total", "HTTP requests handled", ("method", "route", "status"))
+REQUESTS_IN_PROGRESS = REGISTRY.gauge("http_requests_in_progress", "HTTP requests being handled", ("method",))
+REQUEST_ERRORS = REGISTRY.counter(
+    "http_request_errors_total", "HTTP requests that failed with a 5xx status or an exception", ("method", "route"))
+REQUEST_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+
+
+def route_template(scope: dict) -> str:
+    """The matched route's path template; unmatched paths share one label to bound cardinality"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request metrics per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_PROGRESS.inc(method)
+        token = request_scope.set(scope)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception:
+            status = 500
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            request_scope.reset(token)
+            REQUESTS_IN_PROGRESS.dec(method)
+            # The router stores the matched route in the (shared) scope
+            route = route_template(scope)
+            REQUESTS.inc(method, route, str(status))
+            if status >= 500:
+                REQUEST_ERRORS.inc(method, route)
+            REQUEST_LATENCY.observe(elapsed, method, route)
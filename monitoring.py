@@ -0,0 +1,214 @@
+"""
+MongoDB Driver Monitoring
+
+pymongo event listeners that keep lightweight in-process counters, so pool
+starvation (long checkout waits, every connection in use) can be told apart
+from slow queries, and each endpoint's latency can be broken down into the
+MongoDB commands it runs.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from metrics import REGISTRY, request_scope, route_template
+
+# Upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Upper bounds (seconds) of the command duration histogram buckets
+COMMAND_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Driver housekeeping that says nothing about endpoint latency
+IGNORED_COMMANDS = {
+    "hello", "ismaster", "isMaster", "ping", "buildInfo", "buildinfo", "saslStart", "saslContinue",
+    "authenticate", "getnonce", "endSessions", "killCursors",
+}
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool counters: checkout waits, connections in use and churn"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.checkout_failures: Dict[str, int] = {}
+        self.pools_cleared = 0
+        self.wait_count = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets: List[int] = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def _record_wait(self):
+        started = getattr(self._local, "checkout_started", None)
+        if started is None:
+            return
+        self._local.checkout_started = None
+        waited = time.perf_counter() - started
+        self.wait_count += 1
+        self.wait_sum += waited
+        self.wait_max = max(self.wait_max, waited)
+        for i, bound in enumerate(WAIT_BUCKETS):
+            if waited <= bound:
+                self.wait_buckets[i] += 1
+                break
+        else:
+            self.wait_buckets[-1] += 1
+
+    # Checkouts happen on the calling thread, so start and end share a thread-local
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self._record_wait()
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+            self._record_wait()
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checkins += 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "connections_open": self.connections_created - self.connections_closed,
+                "connections_in_use": self.checkouts - self.checkins,
+                "connections_created": self.connections_created,
+                "connections_closed": self.connections_closed,
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "pools_cleared": self.pools_cleared,
+                "checkout_wait": {
+                    "count": self.wait_count,
+                    "sum_seconds": round(self.wait_sum, 6),
+                    "max_seconds": round(self.wait_max, 6),
+                    "buckets": {
+                        **{str(b): n for b, n in zip(WAIT_BUCKETS, self.wait_buckets)},
+                        "+Inf": self.wait_buckets[-1],
+                    },
+                },
+            }
+
+
+COMMAND_LABELS = ("collection", "command", "route", "operation")
+COMMAND_DURATION = REGISTRY.histogram(
+    "mongo_command_duration_seconds", "MongoDB command duration as reported by the driver",
+    COMMAND_LABELS, buckets=COMMAND_BUCKETS)
+COMMAND_DOCUMENTS = REGISTRY.counter(
+    "mongo_command_documents_returned_total", "Documents returned in find, aggregate and getMore batches",
+    COMMAND_LABELS)
+COMMAND_FAILURES = REGISTRY.counter(
+    "mongo_command_failures_total", "MongoDB commands that failed", COMMAND_LABELS + ("code",))
+
+# Optional finer tag for the commands issued inside tag_commands()
+command_operation: ContextVar = ContextVar("command_operation", default="")
+
+
+@contextmanager
+def tag_commands(operation: str):
+    """Label the MongoDB commands issued in this block with an operation name"""
+    token = command_operation.set(operation)
+    try:
+        yield
+    finally:
+        command_operation.reset(token)
+
+
+def current_route() -> str:
+    """Route template of the request being handled, or "background" outside requests"""
+    scope = request_scope.get()
+    return route_template(scope) if scope is not None else "background"
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Per collection, command type and route duration, documents returned and failures
+
+    Listeners run on the thread issuing the command (motor copies the caller's
+    context into its executor), so the route is read from request_scope when
+    the command starts and remembered until its reply arrives.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple, Tuple[str, ...]] = {}
+
+    @staticmethod
+    def _key(event) -> Tuple:
+        return event.connection_id, event.request_id
+
+    @staticmethod
+    def _collection(event) -> str:
+        name = event.command.get("collection") if event.command_name == "getMore" \
+            else event.command.get(event.command_name)
+        # Database level commands (e.g. aggregate: 1) have no collection
+        return name if isinstance(name, str) else "-"
+
+    def _finish(self, event) -> Optional[Tuple[str, ...]]:
+        with self._lock:
+            return self._pending.pop(self._key(event), None)
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        labels = (self._collection(event), event.command_name, current_route(), command_operation.get())
+        with self._lock:
+            self._pending[self._key(event)] = labels
+
+    def succeeded(self, event):
+        labels = self._finish(event)
+        if labels is None:
+            return
+        COMMAND_DURATION.observe(event.duration_micros / 1e6, *labels)
+        cursor = event.reply.get("cursor") if isinstance(event.reply, dict) else None
+        if isinstance(cursor, dict):
+            batch = cursor.get("firstBatch", cursor.get("nextBatch"))
+            if batch:
+                COMMAND_DOCUMENTS.inc(*labels, amount=len(batch))
+
+    def failed(self, event):
+        labels = self._finish(event)
+        if labels is None:
+            return
+        COMMAND_DURATION.observe(event.duration_micros / 1e6, *labels)
+        code = event.failure.get("codeName") or event.failure.get("code") or "unknown"
+        COMMAND_FAILURES.inc(*labels, code)
+
+
+command_metrics = CommandMetrics()
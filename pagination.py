@@ -0,0 +1,79 @@
+"""
+Keyset Pagination Helpers
+
+A cursor is an opaque url-safe string holding the sort values of the last item
+on a page (always ending with _id). The next page is selected with a range
+filter on those values rather than skip(), so deep pages cost the same as the
+first one as long as an index matches the sort.
+"""
+
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import json_util
+
+SortSpec = List[Tuple[str, int]]
+
+
+def _field_value(doc: dict, field: str) -> Any:
+    value: Any = doc
+    for part in field.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def encode_cursor(doc: dict, sort: SortSpec, scope: str = "") -> str:
+    """Cursor pointing just after doc in the given sort order"""
+    payload = {"s": scope, "v": [_field_value(doc, field) for field, _ in sort]}
+    raw = json_util.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: SortSpec, scope: str = "") -> List[Any]:
+    """Sort values stored in a cursor; raises ValueError if it is malformed or for another listing"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json_util.loads(raw)
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(payload, dict) or payload.get("s") != scope:
+        raise ValueError("Invalid cursor")
+    values = payload.get("v")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def keyset_filter(sort: SortSpec, values: List[Any]) -> Dict[str, Any]:
+    """Filter matching documents strictly after values in the given sort order"""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {f: v for (f, _), v in zip(sort[:i], values[:i])}
+        clause[field] = {"$gt" if direction > 0 else "$lt": values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def page_filter(filt: Dict[str, Any], sort: SortSpec, cursor: Optional[str] = None, scope: str = "") -> Dict[str, Any]:
+    """filt narrowed to documents after cursor (unchanged when there is no cursor)"""
+    if not cursor:
+        return filt
+    after = keyset_filter(sort, decode_cursor(cursor, sort, scope))
+    return {"$and": [filt, after]} if filt else after
+
+
+def split_page(items: List[dict], limit: int, sort: SortSpec, scope: str = "") -> Tuple[List[dict], Optional[str]]:
+    """Trim a limit + 1 fetch to one page and build the cursor for the next one"""
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, encode_cursor(items[-1], sort, scope)
+
+
+async def paginate(collection, filt: Dict[str, Any], sort: SortSpec, limit: int,
+                   cursor: Optional[str] = None, scope: str = "", projection=None) -> Tuple[List[dict], Optional[str]]:
+    """Fetch one page from a motor collection; returns (items, next_cursor), next_cursor is None on the last page"""
+    filt = page_filter(filt, sort, cursor, scope)
+    items = await collection.find(filt, projection).sort(sort).limit(limit + 1).to_list(limit + 1)
+    return split_page(items, limit, sort, scope)
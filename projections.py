@@ -0,0 +1,58 @@
+"""
+Field Projections
+
+Endpoints accept `fields=` as either a preset name (e.g. "card") or a comma
+separated list of field names. The result is pushed down to MongoDB as a
+projection so unused fields are never sent over the wire or decoded.
+"""
+
+from typing import Dict, Iterable, List, Optional
+
+from schemas import Restaurant, Review
+
+# Timestamps added by database.create_document
+_COMMON_FIELDS = {"created_at", "updated_at"}
+
+RESTAURANT_FIELDS = set(Restaurant.model_fields) | _COMMON_FIELDS
+REVIEW_FIELDS = set(Review.model_fields) | _COMMON_FIELDS
+
+# None means the full document
+RESTAURANT_PRESETS: Dict[str, Optional[List[str]]] = {
+    "card": ["name", "city", "cuisine", "price_level", "takeaway", "photo_url", "rating_avg", "rating_count"],
+    "detail": None,
+}
+REVIEW_PRESETS: Dict[str, Optional[List[str]]] = {
+    "card": ["user_name", "rating", "comment", "created_at"],
+    "detail": None,
+}
+
+
+def resolve_projection(fields: Optional[str], presets: Dict[str, Optional[List[str]]], allowed: Iterable[str],
+                       required: Iterable[str] = ()) -> Optional[Dict[str, int]]:
+    """Turn a fields= value into a MongoDB projection (None for the full document)
+
+    Fields in `required` (e.g. sort keys needed for cursors) are always included.
+    Raises ValueError for unknown presets or field names.
+    """
+    if not fields:
+        return None
+    if fields in presets:
+        names = presets[fields]
+        if names is None:
+            return None
+    else:
+        names = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in names if f != "id" and f not in allowed]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    projection = {f: 1 for f in names if f != "id"}
+    projection.update({f: 1 for f in required if f != "_id"})
+    # An empty projection would return the whole document; fields=id means only _id
+    return projection or {"_id": 1}
+
+
+def project_document(doc: dict, projection: Optional[Dict[str, int]]) -> dict:
+    """Apply an inclusion projection to an in-memory document (keeps _id)"""
+    if projection is None:
+        return doc
+    return {k: v for k, v in doc.items() if k == "_id" or k in projection}
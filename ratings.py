@@ -0,0 +1,56 @@
+"""
+Rating Aggregate Updates
+
+Restaurants store rating_sum and rating_count. rating_avg is derived from them
+inside the same single-document update, so concurrent reviews never overwrite
+each other and the cost of a write does not grow with the number of reviews.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def rating_increment_pipeline(rating: int, count: int = 1) -> List[Dict[str, Any]]:
+    """Update pipeline adding ratings to a restaurant's aggregates
+
+    rating is the sum of the `count` ratings being added (one review by default).
+    """
+    current = {"$ifNull": ["$rating_count", 0]}
+    # Restaurants written before rating_sum existed start from avg * count
+    total = {"$ifNull": ["$rating_sum", {"$multiply": [{"$ifNull": ["$rating_avg", 0]}, current]}]}
+    return [
+        {"$set": {
+            "rating_sum": {"$add": [total, rating]},
+            "rating_count": {"$add": [current, count]},
+            # Lets other workers' chat indexes pick up the new rating
+            "updated_at": "$$NOW",
+        }},
+        {"$set": {
+            "rating_avg": {"$round": [{"$divide": ["$rating_sum", "$rating_count"]}, 1]},
+        }},
+    ]
+
+
+def rating_recompute_pipeline(restaurant_collection: str,
+                              restaurant_ids: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """Aggregation over reviews that rewrites the aggregates of the given restaurants (all if None)
+
+    One $group per restaurant, written back with $merge. Unlike the increment it
+    discards any avg * count baseline of restaurants whose older ratings were
+    never stored as reviews, so only use it where every review is stored (e.g.
+    freshly seeded restaurants); imports add to the aggregates by increment.
+    """
+    pipeline: List[Dict[str, Any]] = []
+    if restaurant_ids is not None:
+        pipeline.append({"$match": {"restaurant_id": {"$in": list(restaurant_ids)}}})
+    pipeline += [
+        {"$group": {"_id": "$restaurant_id", "rating_sum": {"$sum": "$rating"}, "rating_count": {"$sum": 1}}},
+        {"$project": {
+            "_id": {"$toObjectId": "$_id"},
+            "rating_sum": 1,
+            "rating_count": 1,
+            "rating_avg": {"$round": [{"$divide": ["$rating_sum", "$rating_count"]}, 1]},
+            "updated_at": "$$NOW",
+        }},
+        {"$merge": {"into": restaurant_collection, "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}},
+    ]
+    return pipeline
@@ -0,0 +1,54 @@
+"""
+Fast JSON Responses for MongoDB Documents
+
+MongoJSONResponse serializes raw pymongo documents straight to JSON bytes:
+ObjectIds become strings, datetimes are encoded natively and each document's
+_id is exposed as "id". Endpoints return it directly, which skips FastAPI's
+jsonable_encoder pass over every field.
+"""
+
+from datetime import date, datetime
+from typing import Any
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
+    import json
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if orjson is None and isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def expose_ids(obj: Any) -> Any:
+    """Rename _id to id on documents found in obj
+
+    Only wrapper dicts and lists are descended into; documents themselves are
+    copied shallowly, so their fields are left to the encoder.
+    """
+    if isinstance(obj, list):
+        return [expose_ids(item) for item in obj]
+    if isinstance(obj, dict):
+        if "_id" in obj:
+            doc = {"id": obj["_id"]}
+            doc.update(obj)
+            del doc["_id"]
+            return doc
+        return {key: expose_ids(value) for key, value in obj.items()}
+    return obj
+
+
+class MongoJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        content = expose_ids(content)
+        if orjson is not None:
+            return orjson.dumps(content, default=_default)
+        return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -3,28 +3,61 @@ Database Schemas for the Restaurants Chat App
 
 Each Pydantic model represents a MongoDB collection.
 Collection name is the lowercase of the class name (handled by callers).
+The `indexes` class attribute declares the indexes each collection should have;
+they are reconciled by database.ensure_indexes (on startup or via manage.py).
 """
-from pydantic import BaseModel, Field, HttpUrl
-from typing import List, Optional
+from datetime import datetime
+from pydantic import BaseModel, Field, HttpUrl, model_validator
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from typing import ClassVar, List, Optional
+
+def normalize_city(city: str) -> str:
+    """Normalized form of a city name, stored as Restaurant.city_key for exact-match lookups"""
+    return " ".join(city.split()).lower()
 
 class Restaurant(BaseModel):
     name: str = Field(..., description="Restaurant name")
     address: str = Field(..., description="Street address")
     city: str = Field(..., description="City name")
+    city_key: str = Field("", description="normalize_city(city), filled in automatically")
     cuisine: List[str] = Field(default_factory=list, description="List of cuisines e.g. ['mexican','tacos']")
     dishes: List[str] = Field(default_factory=list, description="Signature dishes e.g. ['ramen','sushi']")
     takeaway: bool = Field(True, description="Offers takeaway")
     price_level: int = Field(2, ge=1, le=4, description="1=budget, 4=premium")
     tags: List[str] = Field(default_factory=list, description="Extra tags e.g. ['vegan','halal','late-night']")
     photo_url: Optional[HttpUrl] = Field(None, description="Hero photo URL")
+    rating_sum: float = Field(0, ge=0, description="Sum of all ratings (rating_avg = rating_sum / rating_count)")
     rating_avg: float = Field(0, ge=0, le=5, description="Average rating")
     rating_count: int = Field(0, ge=0, description="Number of ratings")
 
+    indexes: ClassVar[List[IndexModel]] = [
+        IndexModel([("name", TEXT), ("dishes", TEXT), ("cuisine", TEXT), ("tags", TEXT)], name="restaurant_text"),
+        IndexModel([("city_key", ASCENDING), ("takeaway", ASCENDING), ("price_level", ASCENDING)], name="city_takeaway_price"),
+        IndexModel([("cuisine", ASCENDING), ("takeaway", ASCENDING), ("price_level", ASCENDING)], name="cuisine_takeaway_price"),
+        IndexModel([("tags", ASCENDING), ("price_level", ASCENDING)], name="tags_price"),
+        # Keyset pagination orders used by GET /api/restaurants
+        IndexModel([("city_key", ASCENDING), ("_id", ASCENDING)], name="city_id"),
+        IndexModel([("rating_avg", DESCENDING), ("_id", DESCENDING)], name="rating_id"),
+        IndexModel([("city_key", ASCENDING), ("rating_avg", DESCENDING), ("_id", DESCENDING)], name="city_rating_id"),
+        # Changes polled by every worker's chat index refresh
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ]
+
+    @model_validator(mode="after")
+    def _fill_city_key(self):
+        self.city_key = normalize_city(self.city)
+        return self
+
 class Review(BaseModel):
     restaurant_id: str = Field(..., description="ID of the restaurant (string ObjectId)")
     user_name: str = Field(..., description="Reviewer display name")
     rating: int = Field(..., ge=1, le=5, description="Star rating 1-5")
     comment: Optional[str] = Field(None, description="Review text")
     photos: List[HttpUrl] = Field(default_factory=list, description="Optional photo URLs")
+    created_at: Optional[datetime] = Field(None, description="When the review was written (defaults to insert time)")
+
+    indexes: ClassVar[List[IndexModel]] = [
+        IndexModel([("restaurant_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="restaurant_newest"),
+    ]
 
 # You can extend with additional models (e.g., Conversation) if needed later.
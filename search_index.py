@@ -0,0 +1,260 @@
+"""
+In-memory Inverted Index for Restaurant Search
+
+Each worker process keeps its own copy of the restaurant collection, indexed by
+city, cuisine, tags and name/dish tokens. It is built in the background when
+the app starts, updated by this worker's write endpoints and periodically
+refreshed from MongoDB, so /api/chat can be answered without MongoDB.
+
+Documents are numbered in insertion order and every posting list is kept
+sorted by that number, so a search walks its shortest posting list and stops
+after the first matches instead of sorting every candidate.
+"""
+
+import bisect
+import heapq
+import re
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from itertools import chain
+from threading import RLock
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from schemas import normalize_city
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+# Fields whose values are matched exactly (like a MongoDB equality/$in filter)
+VALUE_FIELDS = ("city", "cuisine", "tags")
+# Fields searched by the free-text fallback
+TEXT_FIELDS = ("name", "dishes", "cuisine", "tags")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens (hyphenated words are kept whole)"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _as_list(value: Any) -> List[str]:
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [v for v in value if isinstance(v, str)]
+    return [value] if isinstance(value, str) else []
+
+
+def _post(postings: Dict[str, List[int]], key: str, seq: int):
+    seqs = postings.get(key)
+    if seqs is None:
+        postings[key] = [seq]
+    elif seqs[-1] < seq:
+        seqs.append(seq)
+    else:
+        bisect.insort(seqs, seq)
+
+
+def _unpost(postings: Dict[str, List[int]], key: str, seq: int):
+    seqs = postings.get(key)
+    if seqs is None:
+        return
+    i = bisect.bisect_left(seqs, seq)
+    if i < len(seqs) and seqs[i] == seq:
+        del seqs[i]
+        if not seqs:
+            del postings[key]
+
+
+class RestaurantIndex:
+    """Inverted index over restaurant documents keyed by their string id"""
+
+    def __init__(self):
+        self._lock = RLock()
+        self._docs: Dict[str, dict] = {}
+        # Insertion number of each document, and back; _ids iterates in seq order
+        self._seq: Dict[str, int] = {}
+        self._ids: Dict[int, str] = {}
+        self._next_seq = 0
+        # kind ("city", "cuisine", "tags", "token") -> key -> sorted seqs
+        self._postings: Dict[str, Dict[str, List[int]]] = {kind: {} for kind in VALUE_FIELDS + ("token",)}
+        self.ready = False
+        # Bumped whenever the contents change, so callers can tell whether derived results are stale
+        self.version = 0
+        # Start time (naive UTC, like pymongo datetimes) of the last build or refresh read
+        self.watermark: Optional[datetime] = None
+        self.built_at: Optional[float] = None
+        self.refreshed_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    # Maintenance
+
+    @staticmethod
+    def read_started() -> datetime:
+        """Watermark to pass to build()/refresh(), taken before the documents are read"""
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    def build(self, docs: Iterable[dict], watermark: Optional[datetime] = None):
+        """Replace the index contents with the given documents"""
+        # Index into a fresh copy without the lock, so searches keep using the
+        # previous contents meanwhile, then swap it in. Writes made meanwhile are
+        # re-read by the next refresh, which starts from the watermark.
+        fresh = RestaurantIndex()
+        for doc in docs:
+            fresh._add(doc)
+        with self._lock:
+            self._docs, self._seq, self._ids = fresh._docs, fresh._seq, fresh._ids
+            self._next_seq, self._postings = fresh._next_seq, fresh._postings
+            self.version += 1
+            self.ready = True
+            self.watermark = watermark
+            self.built_at = self.refreshed_at = time.monotonic()
+
+    def refresh(self, docs: Iterable[dict], watermark: Optional[datetime] = None) -> List[str]:
+        """Upsert documents changed since the last watermark; returns the ids whose contents changed"""
+        changed = [str(doc["_id"]) for doc in docs if self.upsert(doc)]
+        with self._lock:
+            if watermark is not None:
+                self.watermark = watermark
+            self.refreshed_at = time.monotonic()
+        return changed
+
+    def usable(self, max_age: float) -> bool:
+        """Built, not empty and refreshed within max_age seconds"""
+        with self._lock:
+            return (self.ready and bool(self._docs) and self.refreshed_at is not None
+                    and time.monotonic() - self.refreshed_at <= max_age)
+
+    def upsert(self, doc: dict) -> bool:
+        """Add a document, replacing any previous version with the same _id; False if it was unchanged"""
+        with self._lock:
+            return self._add(doc)
+
+    def update_fields(self, doc_id: str, fields: Dict[str, Any]) -> bool:
+        """Apply a partial update to an indexed document; False if the id is unknown"""
+        with self._lock:
+            doc = self._docs.get(doc_id)
+            if doc is None:
+                return False
+            self._add({**doc, **fields})
+            return True
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            doc = self._docs.pop(doc_id, None)
+            if doc is None:
+                return
+            seq = self._seq.pop(doc_id)
+            del self._ids[seq]
+            for kind, key in self._keys(doc):
+                _unpost(self._postings[kind], key, seq)
+            self.version += 1
+
+    def _add(self, doc: dict) -> bool:
+        doc_id = str(doc["_id"])
+        previous = self._docs.get(doc_id)
+        if previous == doc:
+            return False
+        seq = self._seq.get(doc_id)
+        if seq is None:
+            seq = self._seq[doc_id] = self._next_seq
+            self._ids[seq] = doc_id
+            self._next_seq += 1
+        # A replaced document keeps its seq, and only the postings that changed are touched
+        old = self._keys(previous) if previous is not None else set()
+        new = self._keys(doc)
+        for kind, key in old - new:
+            _unpost(self._postings[kind], key, seq)
+        for kind, key in new - old:
+            _post(self._postings[kind], key, seq)
+        self._docs[doc_id] = doc
+        self.version += 1
+        return True
+
+    @staticmethod
+    def _value_keys(doc: dict):
+        city = doc.get("city_key") or doc.get("city")
+        if isinstance(city, str):
+            yield "city", normalize_city(city)
+        for field in ("cuisine", "tags"):
+            for value in _as_list(doc.get(field)):
+                yield field, value
+
+    @classmethod
+    def _keys(cls, doc: dict) -> Set[Tuple[str, str]]:
+        keys = set(cls._value_keys(doc))
+        for field in TEXT_FIELDS:
+            for value in _as_list(doc.get(field)):
+                keys.update(("token", token) for token in tokenize(value))
+        return keys
+
+    # Queries
+
+    def _first(self, seqs: Iterable[int], limit: int, predicate=None) -> List[dict]:
+        # The first matches in insertion order, like an unsorted MongoDB find
+        out, last = [], None
+        for seq in seqs:
+            if seq == last:
+                continue
+            last = seq
+            doc = self._docs[self._ids[seq]]
+            if predicate is None or predicate(doc):
+                out.append(dict(doc))
+                if len(out) >= limit:
+                    break
+        return out
+
+    def search(
+        self,
+        city: Optional[str] = None,
+        cuisines: Optional[List[str]] = None,
+        tags: Optional[List[str]] = None,
+        price_level: Optional[int] = None,
+        takeaway: Optional[bool] = None,
+        limit: int = 12,
+    ) -> List[dict]:
+        """Structured search mirroring the filter chatbot_search sends to MongoDB"""
+        wanted: List[Set[Tuple[str, str]]] = []
+        if city:
+            wanted.append({("city", normalize_city(city))})
+        if cuisines:
+            wanted.append({("cuisine", c) for c in cuisines})
+        if tags:
+            wanted.append({("tags", t) for t in tags})
+
+        def matches(doc: dict) -> bool:
+            if wanted:
+                keys = set(self._value_keys(doc))
+                if not all(keys & alternatives for alternatives in wanted):
+                    return False
+            if price_level:
+                level = doc.get("price_level")
+                if not isinstance(level, (int, float)) or level > price_level:
+                    return False
+            if takeaway is not None and doc.get("takeaway") != takeaway:
+                return False
+            return True
+
+        with self._lock:
+            if not wanted:
+                return self._first(self._ids, limit, matches)
+            # Walk the smallest candidate set; the other conditions are checked per document
+            lists = min(
+                ([self._postings[kind].get(key, []) for kind, key in alternatives] for alternatives in wanted),
+                key=lambda ls: sum(map(len, ls)),
+            )
+            seqs = lists[0] if len(lists) == 1 else heapq.merge(*lists)
+            return self._first(seqs, limit, matches)
+
+    def rank_text(self, query: str, limit: int = 12) -> List[dict]:
+        """Documents containing any query word, ranked by how many words they contain
+
+        Mirrors a MongoDB $text search sorted by textScore.
+        """
+        words = set(tokenize(query))
+        with self._lock:
+            tokens = self._postings["token"]
+            scores = Counter(chain.from_iterable(tokens.get(word, ()) for word in words))
+            ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+            return [dict(self._docs[self._ids[seq]]) for seq, _ in ranked]
@@ -0,0 +1,45 @@
+"""
+Single-flight Request Coalescing
+
+Concurrent callers asking for the same key share one in-flight coroutine and
+its result (or exception) instead of each issuing an identical database query.
+Nothing is cached once the call completes; pair it with cache.TTLCache for that.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await fn() unless a call for key is already running, then await that one
+
+        The call runs as its own task, so a caller that disconnects does not
+        cancel the query for everyone else waiting on it.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+            self.leaders += 1
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every caller went away
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._calls), "leaders": self.leaders, "shared": self.shared}
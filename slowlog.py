@@ -0,0 +1,286 @@
+"""
+Slow Query Log
+
+A pymongo command listener that catches reads slower than SLOW_QUERY_MS and
+records their shape (the command with literal values replaced by "?"), the
+collection and the route that issued them. A background thread runs
+explain("executionStats") once per shape and interval, so plans such as a
+COLLSCAN show up without enabling the database profiler. Entries are appended
+as JSON lines to a size-bounded file that all worker processes share.
+
+Environment:
+    SLOW_QUERY_MS                  threshold in milliseconds (default 100, 0 disables)
+    SLOW_QUERY_LOG                 log file (default logs/slow_queries.jsonl)
+    SLOW_QUERY_LOG_MAX_BYTES       size at which the file is rotated to <file>.1 (default 5 MB)
+    SLOW_QUERY_EXPLAIN_INTERVAL    seconds before the same shape is explained again (default 300)
+"""
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from monitoring import command_operation, current_route
+
+# Reads that explain can run without side effects
+EXPLAINABLE = {"find", "aggregate", "count", "distinct"}
+# Sections whose values describe the query rather than the data, kept as-is
+KEPT_STAGES = {"$sort", "$project", "$limit", "$skip", "$group", "$unwind", "$count"}
+# Driver fields that explain rejects or that do not belong to the query
+DRIVER_FIELDS = {"$db", "lsid", "$clusterTime", "$readPreference", "txnNumber", "readConcern", "$readConcern"}
+
+# Shapes remembered for explain de-duplication
+MAX_SHAPES = 1000
+
+
+def strip_literals(value: Any) -> Any:
+    """Replace every literal in a filter with "?" but keep field names and operators"""
+    if isinstance(value, dict):
+        return {k: strip_literals(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $in/$nin lists and the like collapse to one placeholder regardless of length
+        if value and all(not isinstance(v, (dict, list, tuple)) for v in value):
+            return ["?"]
+        return [strip_literals(v) for v in value]
+    return "?"
+
+
+def _pipeline_shape(pipeline: List[dict]) -> List[dict]:
+    shape = []
+    for stage in pipeline:
+        name = next(iter(stage), None)
+        if name in KEPT_STAGES:
+            shape.append(stage)
+        elif name == "$lookup":
+            lookup = dict(stage[name])
+            if "pipeline" in lookup:
+                lookup["pipeline"] = _pipeline_shape(lookup["pipeline"])
+            shape.append({name: lookup})
+        else:
+            shape.append({name: strip_literals(stage[name])})
+    return shape
+
+
+def query_shape(command_name: str, command: dict) -> Dict[str, Any]:
+    """The parts of a read command that identify its plan, with literals stripped"""
+    if command_name == "find":
+        shape = {"filter": strip_literals(command.get("filter", {}))}
+        for key in ("sort", "projection", "hint"):
+            if key in command:
+                shape[key] = command[key]
+        return shape
+    if command_name == "aggregate":
+        return {"pipeline": _pipeline_shape(command.get("pipeline", []))}
+    if command_name == "count":
+        return {"query": strip_literals(command.get("query", {}))}
+    if command_name == "distinct":
+        return {"key": command.get("key"), "query": strip_literals(command.get("query", {}))}
+    return {}
+
+
+def _shape_id(collection: str, command_name: str, shape: dict) -> str:
+    text = json.dumps([collection, command_name, shape], sort_keys=True, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def summarize_explain(explain: dict) -> Dict[str, Any]:
+    """Plan stages, index names and execution counters from explain("executionStats")"""
+    stats = explain.get("executionStats")
+    planner = explain.get("queryPlanner")
+    # Aggregations nest the find plan under their first $cursor stage
+    if planner is None:
+        for stage in explain.get("stages", []):
+            cursor = stage.get("$cursor") if isinstance(stage, dict) else None
+            if cursor:
+                planner = cursor.get("queryPlanner")
+                stats = stats or cursor.get("executionStats")
+                break
+    stages, indexes = [], []
+
+    def walk(plan):
+        if not isinstance(plan, dict):
+            return
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        if "indexName" in plan:
+            indexes.append(plan["indexName"])
+        for child in ("inputStage", "queryPlan"):
+            walk(plan.get(child))
+        for child in plan.get("inputStages", []):
+            walk(child)
+
+    walk((planner or {}).get("winningPlan"))
+    stats = stats or {}
+    return {
+        "stages": stages,
+        "indexes": indexes,
+        "collscan": "COLLSCAN" in stages,
+        "n_returned": stats.get("nReturned"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "execution_ms": stats.get("executionTimeMillis"),
+    }
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    """Command listener that logs slow reads and explains each new shape in the background
+
+    get_db returns the synchronous database used for explain (None to skip it).
+    """
+
+    def __init__(self, get_db: Callable[[], Any], threshold_ms: Optional[float] = None,
+                 path: Optional[str] = None, max_bytes: Optional[int] = None,
+                 explain_interval: Optional[float] = None):
+        self.get_db = get_db
+        self.threshold_ms = float(os.getenv("SLOW_QUERY_MS", "100")) if threshold_ms is None else threshold_ms
+        self.path = path or os.getenv("SLOW_QUERY_LOG", os.path.join("logs", "slow_queries.jsonl"))
+        self.max_bytes = int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(5 * 1024 * 1024))) \
+            if max_bytes is None else max_bytes
+        self.explain_interval = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "300")) \
+            if explain_interval is None else explain_interval
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple, Tuple] = {}
+        self._explained: "OrderedDict[str, float]" = OrderedDict()
+        self._queue: "queue.Queue[dict]" = queue.Queue(maxsize=1000)
+        self._worker: Optional[threading.Thread] = None
+        self._worker_pid: Optional[int] = None
+        self.dropped = 0
+
+    # Listener
+
+    def started(self, event):
+        if self.threshold_ms <= 0 or event.command_name not in EXPLAINABLE:
+            return
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                event.command, event.database_name, current_route(), command_operation.get())
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < self.threshold_ms:
+            return
+        command, database_name, route, operation = pending
+        collection = command.get(event.command_name)
+        shape = query_shape(event.command_name, command)
+        entry = {
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "shape_id": _shape_id(str(collection), event.command_name, shape),
+            "collection": collection if isinstance(collection, str) else None,
+            "command": event.command_name,
+            "route": route,
+            "operation": operation or None,
+            "duration_ms": round(duration_ms, 3),
+            "failed": isinstance(event, monitoring.CommandFailedEvent),
+            "shape": shape,
+            "explain": None,
+        }
+        explainable = not any(
+            "$out" in stage or "$merge" in stage for stage in command.get("pipeline", []) if isinstance(stage, dict))
+        query = {k: v for k, v in command.items() if k not in DRIVER_FIELDS} if explainable else None
+        self._submit(entry, query, database_name)
+
+    # Background explain and logging
+
+    def _submit(self, entry: dict, command: Optional[dict], database_name: str):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((entry, command, database_name))
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_worker(self):
+        with self._lock:
+            # Threads do not survive fork, so each worker process starts its own
+            if self._worker is None or self._worker_pid != os.getpid() or not self._worker.is_alive():
+                self._worker_pid = os.getpid()
+                self._worker = threading.Thread(target=self._run, name="slow-query-log", daemon=True)
+                self._worker.start()
+
+    def _should_explain(self, shape_id: str) -> bool:
+        now = time.monotonic()
+        last = self._explained.get(shape_id)
+        if last is not None and now - last < self.explain_interval:
+            return False
+        self._explained[shape_id] = now
+        self._explained.move_to_end(shape_id)
+        while len(self._explained) > MAX_SHAPES:
+            self._explained.popitem(last=False)
+        return True
+
+    def _run(self):
+        while True:
+            entry, command, database_name = self._queue.get()
+            try:
+                # Writing stages ($out/$merge) and failed commands are logged without a plan
+                if command is not None and not entry["failed"] and self._should_explain(entry["shape_id"]):
+                    entry["explain"] = self._explain(command, database_name)
+                self._write(entry)
+            except Exception:
+                # Never let one bad entry stop the logger
+                pass
+
+    def _explain(self, command: dict, database_name: str) -> Optional[Dict[str, Any]]:
+        db = self.get_db()
+        if db is None:
+            return None
+        try:
+            explain = db.client[database_name].command(
+                {"explain": command, "verbosity": "executionStats"})
+        except Exception as e:
+            return {"error": str(e)}
+        return summarize_explain(explain)
+
+    def _write(self, entry: dict):
+        line = json.dumps(entry, default=str) + "\n"
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        try:
+            if os.path.getsize(self.path) + len(line) > self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+        except FileNotFoundError:
+            pass
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    # Reading
+
+    def read(self, limit: int = 50, collection: Optional[str] = None, route: Optional[str] = None,
+             explained_only: bool = False) -> List[dict]:
+        """Most recent entries first, from the current and the rotated file"""
+        entries: deque = deque(maxlen=limit)
+        for path in (self.path + ".1", self.path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue
+                        if collection and entry.get("collection") != collection:
+                            continue
+                        if route and entry.get("route") != route:
+                            continue
+                        if explained_only and not entry.get("explain"):
+                            continue
+                        entries.append(entry)
+            except FileNotFoundError:
+                continue
+        return list(reversed(entries))
@@ -1,10 +1,17 @@
 #!/bin/bash
-echo "Starting FastAPI backend server..."
+# Usage: ./start_server.sh [dev|prod]   (or SERVER_MODE=prod)
+#   dev  - single uvicorn process with --reload (default)
+#   prod - gunicorn with N preloaded uvicorn workers, no reload
+#          WEB_CONCURRENCY (default: CPU count), PORT, KEEP_ALIVE, MAX_REQUESTS,
+#          MAX_REQUESTS_JITTER, GRACEFUL_TIMEOUT, WORKER_TIMEOUT,
+#          METRICS_MULTIPROC_DIR (default: logs/metrics, emptied on start)
+MODE="${1:-${SERVER_MODE:-dev}}"
+echo "Starting FastAPI backend server ($MODE mode)..."
 
 # Find and kill MainThread processes
-PIDS=$(ps | grep uvicorn | grep -v grep | awk '{print $1}')
+PIDS=$(ps | grep -E "uvicorn|gunicorn" | grep -v grep | awk '{print $1}')
 if [ ! -z "$PIDS" ]; then
-  echo "Killing uvicorn processes: $PIDS"
+  echo "Killing server processes: $PIDS"
   for pid in $PIDS; do
     kill $pid 2>/dev/null || true
   done
@@ -14,6 +21,28 @@ fi
 mkdir -p logs
 echo "Installing dependencies..."
 pip install -r requirements.txt
-echo "Starting FastAPI server..."
-nohup uvicorn main:app --host 0.0.0.0 --port 8000 --reload > logs/server.log 2>&1 
+
+if [ "$MODE" = "prod" ]; then
+  CPUS=$(nproc 2>/dev/null || getconf _NPROCESSORS_ONLN 2>/dev/null || echo 1)
+  WORKERS="${WEB_CONCURRENCY:-$CPUS}"
+  echo "Starting FastAPI server with $WORKERS workers..."
+  # Workers share /metrics snapshots here, so every scrape reports all of them
+  export METRICS_MULTIPROC_DIR="${METRICS_MULTIPROC_DIR:-logs/metrics}"
+  rm -rf "$METRICS_MULTIPROC_DIR" && mkdir -p "$METRICS_MULTIPROC_DIR"
+  # --max-requests recycles each worker gracefully after a jittered number of requests
+  nohup gunicorn main:app \
+    --worker-class uvicorn.workers.UvicornWorker \
+    --workers "$WORKERS" \
+    --bind "0.0.0.0:${PORT:-8000}" \
+    --preload \
+    --keep-alive "${KEEP_ALIVE:-5}" \
+    --max-requests "${MAX_REQUESTS:-10000}" \
+    --max-requests-jitter "${MAX_REQUESTS_JITTER:-1000}" \
+    --graceful-timeout "${GRACEFUL_TIMEOUT:-30}" \
+    --timeout "${WORKER_TIMEOUT:-60}" \
+    > logs/server.log 2>&1 &
+else
+  echo "Starting FastAPI server..."
+  nohup uvicorn main:app --host 0.0.0.0 --port 8000 --reload > logs/server.log 2>&1
+fi
 echo "Server started in background"
@@ -0,0 +1,233 @@
+"""
+Synthetic Data for Load Testing
+
+Generates restaurants and reviews with a production-like, skewed shape:
+cities, cuisines and the number of reviews per restaurant all follow Zipf
+distributions. seed_synthetic() bulk-inserts them in parallel worker
+processes, each generating and writing its own batches.
+
+Generation is deterministic for a given seed, and restaurant ids are derived
+from (run_id, index) so review batches never need to look restaurants up.
+"""
+
+import bisect
+import functools
+import itertools
+import logging
+import math
+import random
+import struct
+import time
+from datetime import datetime, timedelta, timezone
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+
+from database import ensure_indexes, get_db
+from ratings import rating_recompute_pipeline
+from schemas import Restaurant, Review, normalize_city
+
+logger = logging.getLogger(__name__)
+
+# Ordered roughly by size, so the Zipf head lands on the big cities
+CITIES = [
+    "London", "Birmingham", "Manchester", "Leeds", "Glasgow", "Liverpool", "Bristol", "Sheffield",
+    "Edinburgh", "Cardiff", "Leicester", "Newcastle", "Nottingham", "Brighton", "Southampton",
+    "Belfast", "Coventry", "Hull", "Bradford", "Plymouth", "Stoke-on-Trent", "Wolverhampton",
+    "Derby", "Swansea", "Aberdeen", "Portsmouth", "York", "Oxford", "Cambridge", "Norwich",
+    "Dundee", "Exeter", "Bath", "Reading", "Milton Keynes", "Sunderland", "Preston", "Inverness",
+]
+
+# Cuisine keywords understood by /api/chat, with typical dishes, most common first
+CUISINES: Dict[str, List[str]] = {
+    "italian": ["margherita", "carbonara", "lasagne", "tiramisu"],
+    "indian": ["butter chicken", "lamb rogan josh", "chana masala", "garlic naan"],
+    "chinese": ["kung pao chicken", "char siu bao", "mapo tofu", "chow mein"],
+    "pizza": ["pepperoni pizza", "calzone", "garlic bread"],
+    "burger": ["cheeseburger", "smash burger", "loaded fries"],
+    "thai": ["pad thai", "green curry", "tom yum", "massaman curry"],
+    "japanese": ["tonkotsu", "gyoza", "katsu curry", "tempura"],
+    "mexican": ["al pastor tacos", "burrito", "elote", "quesadilla"],
+    "sushi": ["salmon nigiri", "dragon roll", "sashimi platter"],
+    "ramen": ["spicy miso", "shoyu ramen", "tantanmen"],
+    "korean": ["bibimbap", "korean fried chicken", "kimchi jjigae"],
+    "asian": ["bao buns", "dumplings", "fried rice"],
+    "bbq": ["brisket", "pulled pork", "smoked ribs"],
+    "noodle": ["dan dan noodles", "laksa", "udon"],
+    "vegan": ["jackfruit tacos", "buddha bowl", "seitan burger"],
+    "vegetarian": ["halloumi wrap", "falafel", "veggie lasagne"],
+    "halal": ["lamb shawarma", "chicken tikka", "mixed grill"],
+    "dessert": ["churros", "gelato", "waffles", "cheesecake"],
+}
+CUISINE_NAMES = list(CUISINES)
+
+TAGS = ["late-night", "colourful", "spicy", "cozy", "family", "vegan-options", "outdoor-seating", "date-night"]
+NAME_FIRST = ["Neon", "Golden", "Urban", "Little", "Brick", "Rusty", "Velvet", "Lucky", "Wild", "Graffiti",
+              "Copper", "Midnight", "Happy", "Smoky", "Red", "Blue", "Secret", "Corner"]
+NAME_SECOND = ["Kitchen", "Noodles", "Taqueria", "Grill", "Canteen", "Diner", "Bistro", "Bar", "House",
+               "Shack", "Garden", "Lab", "Table", "Oven", "Wok", "Cellar"]
+STREETS = ["High St", "Market St", "Station Rd", "Church Lane", "Mill Rd", "Brick Lane", "Queen St", "King St"]
+COMMENTS = [
+    "Great food, will be back", "Portions were huge", "A bit slow but worth it", "Best in town",
+    "Decent but overpriced", "Lovely staff", "Too spicy for me", "Perfect late-night spot", None,
+]
+
+REVIEW_WINDOW = timedelta(days=730)
+
+
+class Zipf:
+    """Draws ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** s"""
+
+    def __init__(self, n: int, s: float = 1.1):
+        self._cumulative = list(itertools.accumulate(1.0 / (k + 1) ** s for k in range(n)))
+
+    def sample(self, rng: random.Random) -> int:
+        return bisect.bisect_left(self._cumulative, rng.random() * self._cumulative[-1])
+
+
+@functools.lru_cache(maxsize=16)
+def zipf(n: int, s: float) -> Zipf:
+    """Shared Zipf table, so each process builds it once rather than once per batch"""
+    return Zipf(n, s)
+
+
+def restaurant_oid(run_id: int, index: int) -> ObjectId:
+    """Deterministic restaurant _id: run timestamp followed by the restaurant index"""
+    return ObjectId(struct.pack(">IQ", run_id, index))
+
+
+def _spread(n: int) -> int:
+    """A multiplier coprime with n, used to scatter Zipf ranks over restaurant indexes"""
+    step = 2654435761 % n if n > 1 else 1
+    while math.gcd(step, n) != 1:
+        step += 1
+    return step
+
+
+def _quality(index: int) -> float:
+    # Cheap deterministic per-restaurant mean rating in [2.5, 4.8]
+    return 2.5 + 2.3 * ((index * 2654435761) % 2 ** 32) / 2 ** 32
+
+
+def generate_restaurants(run_id: int, start: int, count: int, seed: int = 0,
+                         now: Optional[datetime] = None) -> Iterator[dict]:
+    rng = random.Random(seed * 1_000_003 + start)
+    cities = zipf(len(CITIES), 1.2)
+    cuisines = zipf(len(CUISINE_NAMES), 1.0)
+    now = now or datetime.now(timezone.utc)
+    for i in range(start, start + count):
+        created_at = now - 2 * REVIEW_WINDOW * rng.random()
+        city = CITIES[cities.sample(rng)]
+        cuisine = sorted({CUISINE_NAMES[cuisines.sample(rng)] for _ in range(rng.choice((1, 1, 2)))})
+        dishes = [d for c in cuisine for d in rng.sample(CUISINES[c], 2)]
+        yield {
+            "_id": restaurant_oid(run_id, i),
+            "name": f"{rng.choice(NAME_FIRST)} {rng.choice(NAME_SECOND)} {i}",
+            "address": f"{rng.randint(1, 250)} {rng.choice(STREETS)}",
+            "city": city,
+            "city_key": normalize_city(city),
+            "cuisine": cuisine,
+            "dishes": dishes,
+            "takeaway": rng.random() < 0.8,
+            "price_level": rng.choices((1, 2, 3, 4), weights=(35, 40, 18, 7))[0],
+            "tags": rng.sample(TAGS, rng.choice((0, 1, 1, 2, 3))),
+            "photo_url": None,
+            "rating_sum": 0,
+            "rating_avg": 0,
+            "rating_count": 0,
+            "created_at": created_at,
+            # Written now, so running workers' chat indexes pick the restaurant up
+            "updated_at": now,
+        }
+
+
+def generate_reviews(run_id: int, restaurants: int, start: int, count: int, seed: int = 0,
+                     zipf_s: float = 1.0, now: Optional[datetime] = None) -> Iterator[dict]:
+    """Reviews whose restaurant is Zipf distributed, so a few restaurants get most of them"""
+    rng = random.Random(seed * 1_000_003 + start + 1)
+    popularity = zipf(restaurants, zipf_s)
+    step = _spread(restaurants)
+    now = now or datetime.now(timezone.utc)
+    for i in range(start, start + count):
+        index = (popularity.sample(rng) * step) % restaurants
+        created_at = now - REVIEW_WINDOW * rng.random()
+        yield {
+            "restaurant_id": str(restaurant_oid(run_id, index)),
+            "user_name": f"user{rng.randint(1, 10 * restaurants)}",
+            "rating": min(5, max(1, round(rng.gauss(_quality(index), 0.9)))),
+            "comment": rng.choice(COMMENTS),
+            "photos": [],
+            "created_at": created_at,
+            "updated_at": created_at,
+        }
+
+
+def _tasks(total: int, batch_size: int) -> Iterator[Tuple[int, int]]:
+    for start in range(0, total, batch_size):
+        yield start, min(batch_size, total - start)
+
+
+def _insert_batch(task: tuple) -> Tuple[str, int]:
+    """Worker entry point: generate one batch and insert it (each process has its own client)"""
+    kind, run_id, restaurants, start, count, seed, zipf_s = task
+    if kind == "restaurant":
+        docs = list(generate_restaurants(run_id, start, count, seed))
+    else:
+        docs = list(generate_reviews(run_id, restaurants, start, count, seed, zipf_s))
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+    db[kind].insert_many(docs, ordered=False, bypass_document_validation=True)
+    return kind, count
+
+
+def seed_synthetic(restaurants: int, reviews: int, workers: int = 4, batch_size: int = 5000,
+                   seed: int = 0, zipf_s: float = 1.0, progress=None,
+                   rebuild_indexes: bool = False) -> Dict[str, int]:
+    """Insert synthetic restaurants and reviews, then build indexes and rating aggregates
+
+    progress, if given, is called as progress(collection, inserted_so_far).
+    Indexes whose definition changed are only logged unless rebuild_indexes is
+    set, as dropping them belongs to manage.py rather than a request worker.
+    """
+    db = get_db()
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    run_id = int(time.time())
+    rest_col = Restaurant.__name__.lower()
+    rev_col = Review.__name__.lower()
+    tasks = [("restaurant", run_id, restaurants, s, n, seed, zipf_s) for s, n in _tasks(restaurants, batch_size)]
+    if restaurants:
+        tasks += [("review", run_id, restaurants, s, n, seed, zipf_s) for s, n in _tasks(reviews, batch_size)]
+
+    inserted = {rest_col: 0, rev_col: 0}
+    started = time.perf_counter()
+    if workers > 1:
+        with Pool(workers) as pool:
+            # Restaurants first, so reviews never reference missing restaurants for long
+            for kind, count in pool.imap_unordered(_insert_batch, tasks):
+                inserted[kind] += count
+                if progress:
+                    progress(kind, inserted[kind])
+    else:
+        for task in tasks:
+            kind, count = _insert_batch(task)
+            inserted[kind] += count
+            if progress:
+                progress(kind, inserted[kind])
+
+    for model in (Restaurant, Review):
+        name = model.__name__.lower()
+        summary = ensure_indexes(name, model.indexes, rebuild=rebuild_indexes)
+        if summary["failed"]:
+            logger.error("Could not create indexes on %s: %s", name, "; ".join(summary["failed"]))
+        if summary["outdated"]:
+            logger.warning("Outdated indexes on %s (run manage.py ensure-indexes): %s",
+                           name, ", ".join(summary["outdated"]))
+    # Only this run's restaurants: others may carry a legacy baseline or ids that are not ObjectIds
+    for start, count in _tasks(restaurants, batch_size):
+        ids = [str(restaurant_oid(run_id, i)) for i in range(start, start + count)]
+        db[rev_col].aggregate(rating_recompute_pipeline(rest_col, ids), allowDiskUse=True)
+    return {**inserted, "run_id": run_id, "seconds": round(time.perf_counter() - started, 1)}